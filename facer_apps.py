@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""Switches lighting (and optionally the platform profile) while chosen programs run.
+
+Rules are read from ~/.config/predator/apps.json, for example:
+
+    [
+        {"match": "steam_app_|\\\\.exe\\\\b", "profile": "gaming", "platform_profile": "performance"},
+        {"match": "\\\\b(make|ninja|cargo)\\\\b", "profile": "compile"}
+    ]
+
+`match` is a regular expression searched in the process command line. When
+several rules have running processes the first rule in the file wins. When
+none is running any more the last applied lighting (facer_rgb.py --restore)
+and the previous platform profile come back.
+
+Process starts and exits are taken from the kernel proc connector (netlink,
+needs root). Without it /proc is rescanned every second, but only PIDs that
+were not seen before have their command line read.
+"""
+import argparse
+import json
+import os
+import re
+import select
+import signal
+import socket
+import struct
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import NamedTuple
+
+from facer_caps import capabilities
+from facer_rgb import PLATFORM_PROFILE, apply_settings, load_profile, profile_settings, restore_state
+
+APPS_FILE = str(Path.home()) + "/.config/predator/apps.json"
+SCAN_INTERVAL = 1.0
+# Command lines whose match result is remembered, the least recently seen are dropped first
+MATCH_CACHE_SIZE = 1024
+
+NETLINK_CONNECTOR = 11
+CN_IDX_PROC = 1
+CN_VAL_PROC = 1
+PROC_CN_MCAST_LISTEN = 1
+NLMSG_DONE = 3
+PROC_EVENT_EXEC = 0x00000002
+PROC_EVENT_EXIT = 0x80000000
+# struct nlmsghdr + struct cn_msg
+NETLINK_HEADER = struct.Struct("=IHHII")
+CN_HEADER = struct.Struct("=IIIIHH")
+# struct proc_event: what, cpu, timestamp_ns, then process_pid, process_tgid for exec and exit
+PROC_EVENT = struct.Struct("=IIQII")
+
+
+class Rule(NamedTuple):
+    pattern: str
+    profile: str
+    platform_profile: str | None
+
+
+def load_rules(path: str = APPS_FILE) -> list[Rule]:
+    with open(path, 'rt') as f:
+        return [Rule(entry["match"], entry["profile"], entry.get("platform_profile")) for entry in json.load(f)]
+
+
+class Matcher:
+    """Matches command lines against every rule with one compiled expression.
+
+    The rules are joined into a single alternation that rejects most command
+    lines in one search; the results of the last MATCH_CACHE_SIZE command lines
+    are cached since the same programs start over and over. Rules with inline
+    flags such as (?i) or with groups (whose backreferences would be
+    renumbered) cannot be joined, those rule sets are matched one rule at a
+    time.
+    """
+
+    def __init__(self, rules: list[Rule], cache_size: int = MATCH_CACHE_SIZE) -> None:
+        self.rules = rules
+        self.cache_size = cache_size
+        self._cache: OrderedDict[str, int | None] = OrderedDict()
+        self._patterns = [re.compile(rule.pattern) for rule in rules]
+        default_flags = re.compile("").flags
+        self._combined = None
+        if rules and all(pattern.flags == default_flags and not pattern.groups for pattern in self._patterns):
+            self._combined = re.compile("|".join(f"(?:{rule.pattern})" for rule in rules))
+
+    def match(self, cmdline: str) -> int | None:
+        """Returns the index of the first rule matching the command line."""
+        if cmdline in self._cache:
+            self._cache.move_to_end(cmdline)
+            return self._cache[cmdline]
+        result = None
+        if self._combined is None or self._combined.search(cmdline):
+            # The alternation reports the leftmost match, the first rule in the file has to win
+            result = next((idx for idx, pattern in enumerate(self._patterns) if pattern.search(cmdline)), None)
+        self._cache[cmdline] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+
+def read_cmdline(proc_root: str, pid: int) -> str | None:
+    try:
+        with open(f"{proc_root}/{pid}/cmdline", 'rb') as f:
+            raw = f.read()
+    except OSError:
+        return None
+    return raw.rstrip(b"\0").replace(b"\0", b" ").decode(errors="replace")
+
+
+class AppWatcher:
+    def __init__(self, rules: list[Rule], proc_root: str = "/proc", platform_profile: str = PLATFORM_PROFILE,
+                 apply=None, restore=None) -> None:
+        self.matcher = Matcher(rules)
+        self.rules = rules
+        self.proc_root = proc_root
+        self.platform_profile = platform_profile
+        self.apply = apply or self._apply_rule
+        self.restore = restore or self._restore
+        self.known_pids: set[int] = set()
+        self.matched: dict[int, int] = {}
+        self.active: int | None = None
+        self._saved_platform_profile: str | None = None
+        self.switches = 0
+        self.latencies: list[float] = []
+
+    def _apply_rule(self, rule: Rule) -> None:
+        # Not recorded as the last state, so the user's own lighting can be restored afterwards
+        apply_settings(profile_settings(load_profile(rule.profile)), record=False)
+        if rule.platform_profile and self.platform_profile == PLATFORM_PROFILE:
+            caps = capabilities()
+            if rule.platform_profile not in caps.platform_profile_choices:
+                print(f"Platform profile '{rule.platform_profile}' is not supported here "
+                      f"(choices: {' '.join(caps.platform_profile_choices) or 'none'})")
+                return
+        if rule.platform_profile:
+            if self._saved_platform_profile is None:
+                with open(self.platform_profile, 'rt') as f:
+                    self._saved_platform_profile = f.read().strip()
+            with open(self.platform_profile, 'wt') as f:
+                f.write(rule.platform_profile)
+
+    def _restore(self) -> None:
+        restore_state()
+        if self._saved_platform_profile is not None:
+            with open(self.platform_profile, 'wt') as f:
+                f.write(self._saved_platform_profile)
+            self._saved_platform_profile = None
+
+    def process_started(self, pid: int) -> None:
+        self.known_pids.add(pid)
+        cmdline = read_cmdline(self.proc_root, pid)
+        if cmdline:
+            idx = self.matcher.match(cmdline)
+            if idx is not None:
+                self.matched[pid] = idx
+            elif pid in self.matched:
+                # exec() replaced a matched program with another one
+                del self.matched[pid]
+
+    def process_exited(self, pid: int) -> None:
+        self.known_pids.discard(pid)
+        self.matched.pop(pid, None)
+
+    def scan(self) -> None:
+        """Incremental /proc scan: only PIDs that appeared since the last scan are read."""
+        pids = {int(name) for name in os.listdir(self.proc_root) if name.isdigit()}
+        for pid in self.known_pids - pids:
+            self.process_exited(pid)
+        for pid in pids - self.known_pids:
+            self.process_started(pid)
+
+    def update(self, event_ns: int | None = None) -> bool:
+        """Applies the rule that should be active now, returns True when the lighting switched."""
+        wanted = min(self.matched.values(), default=None)
+        if wanted == self.active:
+            return False
+        try:
+            if wanted is None:
+                self.restore()
+            else:
+                self.apply(self.rules[wanted])
+        except OSError as exc:
+            print(f"Could not switch the lighting: {exc}")
+        self.active = wanted
+        self.switches += 1
+        if event_ns is not None:
+            self.latencies.append((time.monotonic_ns() - event_ns) / 1e6)
+        name = "previous lighting" if wanted is None else f"profile '{self.rules[wanted].profile}'"
+        print(f"Switched to {name}")
+        return True
+
+    def stats(self) -> str:
+        usage = time.process_time()
+        text = f"switches: {self.switches}, cpu time: {usage:.3f} s"
+        if self.latencies:
+            ordered = sorted(self.latencies)
+            text += f", latency median: {ordered[len(ordered) // 2]:.2f} ms, max: {ordered[-1]:.2f} ms"
+        return text
+
+    def run_scanner(self) -> None:
+        while True:
+            started = time.monotonic_ns()
+            self.scan()
+            self.update(started)
+            time.sleep(SCAN_INTERVAL)
+
+    def run_connector(self, sock: socket.socket) -> None:
+        poller = select.poll()
+        poller.register(sock, select.POLLIN)
+        while True:
+            poller.poll()
+            data = sock.recv(4096)
+            offset = 0
+            event_ns = None
+            while offset + NETLINK_HEADER.size <= len(data):
+                length = NETLINK_HEADER.unpack_from(data, offset)[0]
+                event = offset + NETLINK_HEADER.size + CN_HEADER.size
+                if event + PROC_EVENT.size <= len(data):
+                    what, _cpu, timestamp_ns, pid, tgid = PROC_EVENT.unpack_from(data, event)
+                    # Only thread group leaders, threads come and go with their process
+                    if pid == tgid and what == PROC_EVENT_EXEC:
+                        self.process_started(pid)
+                        event_ns = timestamp_ns
+                    elif pid == tgid and what == PROC_EVENT_EXIT:
+                        self.process_exited(pid)
+                        event_ns = timestamp_ns
+                offset += max(length, NETLINK_HEADER.size)
+            if event_ns is not None:
+                self.update(event_ns)
+
+
+def open_proc_connector() -> socket.socket | None:
+    """Subscribes to process events, returns None when the kernel or the permissions do not allow it."""
+    try:
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_CONNECTOR)
+        sock.bind((os.getpid(), CN_IDX_PROC))
+        body = CN_HEADER.pack(CN_IDX_PROC, CN_VAL_PROC, 0, 0, 4, 0) + struct.pack("=I", PROC_CN_MCAST_LISTEN)
+        sock.send(NETLINK_HEADER.pack(NETLINK_HEADER.size + len(body), NLMSG_DONE, 0, 0, os.getpid()) + body)
+        return sock
+    except OSError:
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('-c', dest='config', default=APPS_FILE, help="Rules file")
+    parser.add_argument('--proc-root', default='/proc', help="Root of the proc tree to watch")
+    parser.add_argument('--scan', action='store_true', help="Use the /proc scan even if the proc connector works")
+    args = parser.parse_args()
+
+    watcher = AppWatcher(load_rules(args.config), args.proc_root)
+    # kill -USR1 <pid> prints switch latency and cpu usage
+    signal.signal(signal.SIGUSR1, lambda _signum, _frame: print(watcher.stats(), flush=True))
+
+    sock = None if args.scan or args.proc_root != '/proc' else open_proc_connector()
+    try:
+        # Processes that already run when we start
+        watcher.scan()
+        watcher.update()
+        if sock is not None:
+            print("Watching process events through the proc connector")
+            watcher.run_connector(sock)
+        else:
+            print(f"Proc connector unavailable, scanning {args.proc_root} every {SCAN_INTERVAL:g} s")
+            watcher.run_scanner()
+    except KeyboardInterrupt:
+        print(watcher.stats())
+
+
+if __name__ == "__main__":
+    main()
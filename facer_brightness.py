@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""Changes only the brightness of the current lighting, fast enough for a repeating hotkey.
+
+The last dynamic payload written by facer_rgb.py (and the GUI, keyboard.py, ...)
+is read from ~/.config/predator/last_state.json, byte 2 (brightness) is
+patched and the payload is written again, so the effect, speed and colours stay
+as they are. Nothing else is written in static mode, the zone colours are kept
+by the firmware.
+
+When the key is held down the repeats start many processes. Each one records
+its step in a pending file and only one of them writes: it keeps taking the
+steps collected so far and writes at most once every MIN_WRITE_INTERVAL
+seconds (less often if facer_calibrate.py measured a slower device), the
+others exit right away.
+
+Sample key bindings:
+./facer_brightness.py up
+./facer_brightness.py down 5
+./facer_brightness.py set 40
+"""
+import argparse
+import fcntl
+import json
+import os
+import time
+from pathlib import Path
+
+from facer_calibrate import max_write_rate
+from facer_rgb import CHARACTER_DEVICE, STATE_FILE, load_state, save_state, state_lock, write_payload
+
+PENDING_FILE = str(Path.home()) + "/.config/predator/brightness_pending.json"
+WRITER_LOCK = str(Path.home()) + "/.config/predator/brightness_writer.lock"
+DEFAULT_STEP = 10
+MAX_BRIGHTNESS = 100
+MIN_WRITE_INTERVAL = 0.05
+
+
+def _update_pending(fd: int, change=None) -> dict:
+    """Reads the pending request and replaces it, under the pending file lock.
+
+    `change` is called with the current request and returns the new one; the
+    request is {"set": brightness or None, "delta": steps to add}.
+    """
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    try:
+        os.lseek(fd, 0, os.SEEK_SET)
+        raw = os.read(fd, 256)
+        try:
+            pending = json.loads(raw) if raw else {}
+        except ValueError:
+            pending = {}
+        pending = {"set": pending.get("set"), "delta": pending.get("delta", 0)}
+        if change is not None:
+            os.ftruncate(fd, 0)
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.write(fd, json.dumps(change(pending)).encode())
+        return pending
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+def request(action: str, value: int) -> None:
+    """Adds one key press to the pending request."""
+    def change(pending: dict) -> dict:
+        if action == "set":
+            return {"set": value, "delta": 0}
+        pending["delta"] += value if action == "up" else -value
+        return pending
+
+    fd = os.open(PENDING_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        _update_pending(fd, change)
+    finally:
+        os.close(fd)
+
+
+def apply_pending(device: str = CHARACTER_DEVICE) -> int:
+    """Writes the pending requests if no other process is doing it, returns the number of writes."""
+    writer = os.open(WRITER_LOCK, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(writer, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        # The process holding the lock picks our step up before it stops
+        os.close(writer)
+        return 0
+
+    pending_fd = os.open(PENDING_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+    interval = max(MIN_WRITE_INTERVAL, 1 / max_write_rate("dynamic", 1 / MIN_WRITE_INTERVAL))
+    writes = 0
+    try:
+        while True:
+            taken = {}
+
+            def take(pending: dict) -> dict:
+                taken.update(pending)
+                if pending["set"] is None and not pending["delta"]:
+                    # Nothing left; the writer lock is dropped while the pending file is still
+                    # locked, so a step recorded after this check finds the writer lock free
+                    fcntl.flock(writer, fcntl.LOCK_UN)
+                return {"set": None, "delta": 0}
+
+            _update_pending(pending_fd, take)
+            if taken["set"] is None and not taken["delta"]:
+                return writes
+
+            started = time.monotonic()
+            set_brightness(taken["set"], taken["delta"], device)
+            writes += 1
+            # Repeats arriving meanwhile are merged into the next write
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+    finally:
+        os.close(pending_fd)
+        os.close(writer)
+
+
+def set_brightness(absolute: int | None, delta: int, device: str = CHARACTER_DEVICE) -> int:
+    """Patches the brightness of the last dynamic payload, writes and records it."""
+    with state_lock():
+        state = load_state()
+        if not state["dynamic"]:
+            raise FileNotFoundError(f"No lighting state saved in '{STATE_FILE}' yet")
+        payload = bytearray.fromhex(state["dynamic"])
+        brightness = payload[2] if absolute is None else absolute
+        brightness = min(MAX_BRIGHTNESS, max(0, brightness + delta))
+        if brightness != payload[2]:
+            payload[2] = brightness
+            write_payload(device, bytes(payload))
+            state["dynamic"] = payload.hex()
+            save_state(state)
+    return brightness
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('action', choices=('up', 'down', 'set'))
+    parser.add_argument('value', type=int, nargs='?',
+                        help=f"Step for up/down ({DEFAULT_STEP} by default), brightness 0-{MAX_BRIGHTNESS} for set")
+    args = parser.parse_args()
+
+    if args.action == 'set' and args.value is None:
+        parser.error("set needs a brightness value")
+    value = DEFAULT_STEP if args.value is None else args.value
+
+    request(args.action, value)
+    try:
+        apply_pending()
+    except FileNotFoundError as exc:
+        print(exc)
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
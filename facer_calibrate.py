@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""Measures how many writes per second the keyboard devices sustain.
+
+Every write to the static device ends in a WMI call and every write to the
+dynamic device in a firmware call; both block the writer and their speed
+depends on the machine. The calibration writes the last applied payload
+(so the lighting does not change) at increasing rates and records, per
+rate, the rate reached and the write latency. A rate is saturated when it
+can no longer be reached or writes take longer than the interval between
+them.
+
+The highest unsaturated rate, with some headroom, is stored for the current
+model (DMI product name) in ~/.config/predator/calibration.json. Software
+animations (transitions, the visualiser, brightness hotkeys) read it through
+max_write_rate() and stay below it.
+
+--fake runs the same ramp against a simulated device with the given write
+latency, without touching the keyboard or the stored calibration:
+./facer_calibrate.py --fake 8 --jitter 2
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+from facer_color import model_name
+from facer_files import write_atomic
+
+CALIBRATION_FILE = str(Path.home()) + "/.config/predator/calibration.json"
+# Stored limits are this fraction of the highest rate that was sustained
+HEADROOM = 0.8
+
+_calibration: dict | None = None
+
+
+class Step(NamedTuple):
+    rate: float
+    achieved: float
+    p50: float
+    p99: float
+    saturated: bool
+
+
+class FakeDevice:
+    """Stands in for a device node, each write blocks for latency +- jitter milliseconds."""
+
+    def __init__(self, latency: float, jitter: float = 0.0) -> None:
+        self.latency = latency / 1000
+        self.jitter = jitter / 1000
+        self.writes = 0
+
+    def write(self, payload: bytes) -> int:
+        time.sleep(max(0.0, random.uniform(self.latency - self.jitter, self.latency + self.jitter)))
+        self.writes += 1
+        return len(payload)
+
+    def close(self) -> None:
+        pass
+
+
+def measure(device, payload: bytes, rate: float, duration: float) -> Step:
+    """Writes `payload` at `rate` writes per second for `duration` seconds."""
+    interval = 1 / rate
+    latencies = []
+    started = time.monotonic()
+    next_write = started
+    while True:
+        now = time.monotonic()
+        if now - started >= duration:
+            break
+        if next_write > now:
+            time.sleep(next_write - now)
+        write_started = time.perf_counter()
+        device.write(payload)
+        latencies.append(time.perf_counter() - write_started)
+        next_write += interval
+    achieved = len(latencies) / (time.monotonic() - started)
+    latencies.sort()
+    p50 = statistics.median(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return Step(rate, achieved, p50, p99, achieved < rate * 0.95 or p99 > interval)
+
+
+def _measure_step(device, payload: bytes, rate: float, duration: float) -> Step:
+    step = measure(device, payload, rate, duration)
+    print(f"\t{step.rate:7.0f}/s -> {step.achieved:7.1f}/s  latency p50 {step.p50 * 1000:6.2f} ms, "
+          f"p99 {step.p99 * 1000:6.2f} ms{'  saturated' if step.saturated else ''}")
+    return step
+
+
+def ramp(device, payload: bytes, start: float, limit: float, duration: float, refine: int = 2) -> list[Step]:
+    """Doubles the rate from `start` until a step saturates or `limit` is reached.
+
+    The saturation point is then narrowed down by bisecting `refine` times
+    between the last sustained rate and the first saturated one.
+    """
+    steps = []
+    rate = start
+    while rate <= limit:
+        steps.append(_measure_step(device, payload, rate, duration))
+        if steps[-1].saturated:
+            break
+        rate *= 2
+    if len(steps) > 1 and steps[-1].saturated:
+        low, high = steps[-2].rate, steps[-1].rate
+        for _ in range(refine):
+            step = _measure_step(device, payload, (low + high) / 2, duration)
+            steps.append(step)
+            if step.saturated:
+                high = step.rate
+            else:
+                low = step.rate
+    return sorted(steps)
+
+
+def summarize(steps: list[Step]) -> dict:
+    sustained = [step for step in steps if not step.saturated]
+    # Even the first rate saturated: what it reached is all the device can do
+    best = sustained[-1] if sustained else steps[0]
+    return {
+        "max_rate": round(min(best.rate, best.achieved) * HEADROOM, 1),
+        "p50_ms": round(best.p50 * 1000, 3),
+        "p99_ms": round(best.p99 * 1000, 3),
+        "steps": [[step.rate, round(step.achieved, 1), round(step.p50 * 1000, 3), round(step.p99 * 1000, 3)]
+                  for step in steps],
+    }
+
+
+def load_calibration(path: str = CALIBRATION_FILE) -> dict:
+    try:
+        with open(path, 'rt') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_calibration(record: dict, path: str = CALIBRATION_FILE) -> None:
+    calibration = load_calibration(path)
+    calibration[model_name() or "unknown"] = record
+    write_atomic(path, json.dumps(calibration, indent=4))
+
+
+def max_write_rate(device: str, default: float) -> float:
+    """Returns the calibrated writes per second of 'static' or 'dynamic' for this model, or `default`."""
+    global _calibration
+    if _calibration is None:
+        _calibration = load_calibration().get(model_name() or "unknown", {})
+    return _calibration.get(device, {}).get("max_rate", default)
+
+
+def main() -> None:
+    from facer_rgb import (
+        CHARACTER_DEVICE,
+        CHARACTER_DEVICE_STATIC,
+        load_state,
+        static_mode_payload,
+        static_payload,
+    )
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--start', type=float, default=10, help="First rate in writes per second")
+    parser.add_argument('--max', type=float, default=1280, help="Highest rate tried")
+    parser.add_argument('--duration', type=float, default=2, help="Seconds spent on every rate")
+    parser.add_argument('--device', choices=('static', 'dynamic', 'both'), default='both')
+    parser.add_argument('--fake', type=float, metavar='MS', help="Simulate a device with this write latency")
+    parser.add_argument('--jitter', type=float, default=0, metavar='MS', help="Latency jitter of the simulated device")
+    parser.add_argument('-o', dest='output', help=f"Calibration file, '{CALIBRATION_FILE}' unless --fake is used")
+    args = parser.parse_args()
+
+    # The last applied payloads are written again so calibrating does not change the lighting
+    state = load_state()
+    payloads = {
+        "static": bytes.fromhex(next(iter(state["static"].values()))) if state["static"]
+        else static_payload(1, 255, 255, 255),
+        "dynamic": bytes.fromhex(state["dynamic"]) if state["dynamic"] else static_mode_payload(100),
+    }
+    paths = {"static": CHARACTER_DEVICE_STATIC, "dynamic": CHARACTER_DEVICE}
+
+    record = {"calibrated": time.strftime("%Y-%m-%dT%H:%M:%S"), "kernel": os.uname().release}
+    for name in (("static", "dynamic") if args.device == 'both' else (args.device,)):
+        if args.fake is not None:
+            device = FakeDevice(args.fake, args.jitter)
+        else:
+            device = open(paths[name], 'wb', buffering=0)
+        print(f"{name} device:")
+        try:
+            record[name] = summarize(ramp(device, payloads[name], args.start, args.max, args.duration))
+        finally:
+            device.close()
+        print(f"\tsustainable: {record[name]['max_rate']} writes/s")
+
+    output = args.output or (None if args.fake is not None else CALIBRATION_FILE)
+    if output:
+        save_calibration(record, output)
+        print(f"Saved for '{model_name() or 'unknown'}' in '{output}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""Probes once what this machine and the loaded module support.
+
+Support differs a lot between models (see the table in the README), so the
+tools ask capabilities() before writing instead of finding out through
+failing writes. The probe looks at the keyboard device node, the fans of the
+module's hwmon device, platform_profile and its choices, and the DMI model.
+hwmon devices are numbered in probe order, so only the fan names are cached
+and fan_paths() finds the module's hwmon directory again when asked.
+
+The result is cached in ~/.config/predator/capabilities.json under a key made
+of the kernel release and the identity of the loaded module, so it is probed
+again after a kernel update or a module reload. A probe that finds the module
+loaded but not its device nodes is not cached, udev may still be creating
+them.
+
+Show the capabilities, probing again:
+./facer_caps.py --refresh
+"""
+import argparse
+import json
+import os
+from pathlib import Path
+from typing import NamedTuple
+
+from facer_color import model_name
+from facer_files import write_atomic
+
+CAPS_FILE = str(Path.home()) + "/.config/predator/capabilities.json"
+MODULE_NAME = "facer"
+# The name attribute of the module's hwmon device
+HWMON_NAME = "acer"
+
+_capabilities = None
+
+
+class Capabilities(NamedTuple):
+    key: str
+    model: str
+    module_loaded: bool
+    dynamic_device: bool
+    fans: list[str]
+    platform_profile: bool
+    platform_profile_choices: list[str]
+
+    def fan_paths(self, sys_root: str = "/sys") -> list[str]:
+        """Returns the fan*_input attributes of the cached fans in the module's current hwmon directory."""
+        hwmon = _module_hwmon(Path(sys_root))
+        if hwmon is None:
+            return []
+        return [str(hwmon / f"{fan}_input") for fan in self.fans if (hwmon / f"{fan}_input").exists()]
+
+
+def _read(path: Path) -> str | None:
+    try:
+        return path.read_text().strip()
+    except OSError:
+        return None
+
+
+def _module_hwmon(sys_path: Path) -> Path | None:
+    for hwmon in sorted((sys_path / "class" / "hwmon").glob("hwmon*")):
+        if _read(hwmon / "name") == HWMON_NAME:
+            return hwmon
+    return None
+
+
+def cache_key(sys_root: str = "/sys") -> str:
+    """Kernel release plus the loaded module's srcversion, or its load time when it has none."""
+    module_dir = Path(sys_root) / "module" / MODULE_NAME
+    version = _read(module_dir / "srcversion")
+    if version is None:
+        try:
+            # sysfs entries are created when the module is loaded
+            version = f"loaded-{module_dir.stat().st_mtime_ns}"
+        except OSError:
+            version = "not-loaded"
+    return f"{os.uname().release}|{version}"
+
+
+def probe(dev_root: str = "/dev", sys_root: str = "/sys") -> Capabilities:
+    sys_path = Path(sys_root)
+    hwmon = _module_hwmon(sys_path)
+    fans = [fan.name[:-len("_input")] for fan in sorted(hwmon.glob("fan*_input"))] if hwmon else []
+    choices = _read(sys_path / "firmware" / "acpi" / "platform_profile_choices")
+    return Capabilities(
+        key=cache_key(sys_root),
+        model=model_name(),
+        module_loaded=(sys_path / "module" / MODULE_NAME).is_dir(),
+        dynamic_device=os.path.exists(f"{dev_root}/acer-gkbbl-0"),
+        fans=fans,
+        platform_profile=(sys_path / "firmware" / "acpi" / "platform_profile").exists(),
+        platform_profile_choices=choices.split() if choices else [],
+    )
+
+
+def capabilities(dev_root: str = "/dev", sys_root: str = "/sys", refresh: bool = False) -> Capabilities:
+    """Returns the cached capabilities when they still match the kernel and module, probes otherwise."""
+    global _capabilities
+    if _capabilities is not None and not refresh:
+        return _capabilities
+    key = cache_key(sys_root)
+    if not refresh:
+        try:
+            with open(CAPS_FILE, 'rt') as f:
+                cached = json.load(f)
+            if cached.get("key") == key:
+                _capabilities = Capabilities(**cached)
+                return _capabilities
+        except (FileNotFoundError, ValueError, TypeError):
+            pass
+    _capabilities = probe(dev_root, sys_root)
+    if not _capabilities.module_loaded or _capabilities.dynamic_device:
+        try:
+            write_atomic(CAPS_FILE, json.dumps(_capabilities._asdict(), indent=4))
+        except OSError:
+            pass
+    return _capabilities
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--refresh', action='store_true', help="Probe again even if the cache is current")
+    parser.add_argument('--dev-root', default='/dev')
+    parser.add_argument('--sys-root', default='/sys')
+    args = parser.parse_args()
+
+    caps = capabilities(args.dev_root, args.sys_root, args.refresh)
+    for name, value in caps._asdict().items():
+        print(f"{name}: {value}")
+    print(f"fan_paths: {caps.fan_paths(args.sys_root)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""Colour correction applied to every colour written to the keyboard.
+
+The LEDs do not respond linearly and their white point depends on the model,
+so colours go through three precomputed 256-entry tables, one per channel,
+that combine gamma, the white balance of the current model (DMI product name)
+and a brightness factor. Correcting a colour costs one table lookup per
+channel; packed frames are corrected with bytes.translate.
+
+Settings are read from ~/.config/predator/color.json, for example:
+
+    {
+        "gamma": 2.2,
+        "brightness": 1.0,
+        "white_balance": {"default": [1.0, 1.0, 1.0], "Predator PH315-53": [1.0, 0.82, 0.7]}
+    }
+
+Without that file the tables are the identity and colours are sent unchanged.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+COLOR_CONFIG_FILE = str(Path.home()) + "/.config/predator/color.json"
+DMI_PRODUCT_NAME = "/sys/class/dmi/id/product_name"
+
+_luts: tuple[bytes, bytes, bytes] | None = None
+
+
+def build_luts(gamma: float = 1.0, white_balance=(1.0, 1.0, 1.0), brightness: float = 1.0) -> tuple[bytes, bytes, bytes]:
+    """Returns one 256-entry table per channel mapping a requested value to the value to write."""
+    luts = []
+    for scale in white_balance:
+        factor = 255.0 * scale * brightness
+        luts.append(bytes(min(255, max(0, round(factor * (value / 255.0) ** gamma))) for value in range(256)))
+    return luts[0], luts[1], luts[2]
+
+
+def model_name() -> str:
+    try:
+        with open(DMI_PRODUCT_NAME, 'rt') as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def load_luts() -> tuple[bytes, bytes, bytes]:
+    try:
+        with open(COLOR_CONFIG_FILE, 'rt') as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        return build_luts()
+    except (OSError, ValueError) as exc:
+        print(f"Ignoring '{COLOR_CONFIG_FILE}': {exc}", file=sys.stderr)
+        return build_luts()
+    try:
+        balances = config.get("white_balance", {})
+        white_balance = balances.get(model_name(), balances.get("default", (1.0, 1.0, 1.0)))
+        gamma, brightness = float(config.get("gamma", 1.0)), float(config.get("brightness", 1.0))
+        red, green, blue = (float(scale) for scale in white_balance)
+        return build_luts(gamma, (red, green, blue), brightness)
+    except (ArithmeticError, AttributeError, KeyError, TypeError, ValueError) as exc:
+        # A broken config must not stop the lighting from being written, colours go out unchanged
+        print(f"Ignoring '{COLOR_CONFIG_FILE}', invalid settings: {exc}", file=sys.stderr)
+        return build_luts()
+
+
+def luts() -> tuple[bytes, bytes, bytes]:
+    """Returns the tables of this machine, built once per process."""
+    global _luts
+    if _luts is None:
+        _luts = load_luts()
+    return _luts
+
+
+def correct(red: int, green: int, blue: int) -> tuple[int, int, int]:
+    if not (0 <= red < 256 and 0 <= green < 256 and 0 <= blue < 256):
+        raise ValueError("RGB values should be between 0 - 255")
+    red_lut, green_lut, blue_lut = luts()
+    return red_lut[red], green_lut[green], blue_lut[blue]
+
+
+def correct_frames(frames: bytes) -> bytearray:
+    """Corrects packed RGB triplets (any number of zones and frames) in three C-level passes."""
+    red_lut, green_lut, blue_lut = luts()
+    out = bytearray(frames)
+    out[0::3] = out[0::3].translate(red_lut)
+    out[1::3] = out[1::3].translate(green_lut)
+    out[2::3] = out[2::3].translate(blue_lut)
+    return out
+
+
+def benchmark(frames: int, zones: int = 4) -> None:
+    data = os.urandom(frames * zones * 3)
+    started = time.perf_counter()
+    correct_frames(data)
+    elapsed = time.perf_counter() - started
+    print(f"correct_frames: {frames} frames x {zones} zones in {elapsed * 1000:.1f} ms "
+          f"({frames / elapsed / 1e6:.2f} M frames/s)")
+
+    sample = data[:min(len(data), 30000 * zones * 3)]
+    started = time.perf_counter()
+    for idx in range(0, len(sample), 3):
+        correct(sample[idx], sample[idx + 1], sample[idx + 2])
+    elapsed = time.perf_counter() - started
+    print(f"correct: {len(sample) // 3} colours in {elapsed * 1000:.1f} ms "
+          f"({len(sample) // 3 / elapsed / 1e6:.2f} M colours/s)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--benchmark', type=int, metavar='FRAMES', help="Times the correction of FRAMES random frames")
+    parser.add_argument('-cR', type=int, dest='red')
+    parser.add_argument('-cG', type=int, dest='green')
+    parser.add_argument('-cB', type=int, dest='blue')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.benchmark)
+        return
+    print(f"model: {model_name() or 'unknown'}")
+    if None not in (args.red, args.green, args.blue):
+        print(f"{args.red} {args.green} {args.blue} -> {' '.join(map(str, correct(args.red, args.green, args.blue)))}")
+
+
+if __name__ == "__main__":
+    main()
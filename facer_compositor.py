@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""Blends several lighting layers into the four static zones.
+
+Every layer is a generator that is sent the current time on each tick and
+yields a (4, 4) float32 array of per-zone RGBA values (RGB 0-255, alpha 0-1).
+Generators own their array and fill it in place; one that returns is
+removed. Layers are blended from the lowest priority up into one frame per
+tick, colour corrected, and only the zones whose colour changed are written
+to the static device.
+
+Layers:
+    profile   a saved profile, firmware effects are rendered by facer_emulator
+    thermal   tint following /sys/firmware/acpi/platform_profile
+    reactive  zones light up on key presses from an evdev keyboard
+    flash     short notification pulse, removes itself when done
+
+Layers can be added and removed while running by writing commands to
+~/.config/predator/compositor.fifo:
+    profile NAME | thermal | reactive /dev/input/eventN | flash R G B [SECONDS] | remove LAYER
+
+echo "flash 255 0 0 1.5" > ~/.config/predator/compositor.fifo
+
+The cost of each tick is printed on exit and on SIGUSR1. The lighting that
+was applied before the compositor started is restored on exit.
+"""
+import argparse
+import math
+import os
+import signal
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+
+from facer_calibrate import max_write_rate
+from facer_color import luts
+from facer_devwatch import DeviceWriter
+from facer_emulator import ZONE_COUNT, render
+from facer_power import frame_rate_cap
+from facer_rgb import (
+    CHARACTER_DEVICE,
+    CHARACTER_DEVICE_STATIC,
+    PAYLOAD_SIZE_STATIC_MODE,
+    PLATFORM_PROFILE,
+    load_profile,
+    profile_settings,
+    restore_state,
+    static_mode_payload,
+    write_payload,
+)
+
+CONTROL_FIFO = str(Path.home()) + "/.config/predator/compositor.fifo"
+DEFAULT_FPS = 30
+# Higher priorities are blended over lower ones
+PRIORITIES = {"profile": 0, "thermal": 10, "reactive": 20, "flash": 30}
+THERMAL_COLORS = {
+    "low-power": (0, 80, 255),
+    "quiet": (0, 80, 255),
+    "balanced-performance": (255, 120, 0),
+    "performance": (255, 0, 0),
+}
+THERMAL_ALPHA = 0.35
+# Linux key codes per zone, keys not listed light the second zone
+KEY_ZONES = {
+    **{code: 0 for code in (*range(1, 7), *range(15, 21), *range(29, 35), *range(41, 48), 56, *range(58, 63))},
+    **{code: 2 for code in (*range(102, 112), 70, 97, 99, 100, 119)},
+    **{code: 3 for code in (*range(71, 84), 55, 69, 96, 98)},
+}
+INPUT_EVENT = struct.Struct("llHHi")
+EV_KEY = 1
+
+
+class Layer(NamedTuple):
+    name: str
+    priority: int
+    source: object
+
+
+def _rgba(color=(0, 0, 0), alpha: float = 1.0) -> np.ndarray:
+    frame = np.empty((ZONE_COUNT, 4), dtype=np.float32)
+    frame[:, :3] = color
+    frame[:, 3] = alpha
+    return frame
+
+
+def profile_source(settings: argparse.Namespace, fps: float):
+    """The firmware lighting of a profile, rendered one second of frames at a time."""
+    frame = _rgba()
+    if settings.mode == 0:
+        # Zones the profile does not color stay transparent
+        scale = max(0, min(settings.brightness, 100)) / 100
+        frame[:, 3] = 0.0
+        for zone in settings.zones:
+            frame[zone - 1] = (settings.red * scale, settings.green * scale, settings.blue * scale, 1.0)
+        yield
+        while True:
+            yield frame
+    count = max(1, round(fps))
+    frames = None
+    batch_start = 0.0
+    now = yield
+    while True:
+        if frames is None or now - batch_start >= 1.0:
+            batch_start = now
+            frames = render(settings.mode, now + np.arange(count) / fps, settings.speed, settings.brightness,
+                            settings.direction, (settings.red, settings.green, settings.blue))
+        frame[:, :3] = frames[min(int((now - batch_start) * fps), count - 1)]
+        now = yield frame
+
+
+def flash_source(color: tuple[int, int, int], duration: float = 1.0, pulses: int = 2):
+    frame = _rgba(color, 0.0)
+    started = yield
+    now = started
+    while now - started < duration:
+        frame[:, 3] = abs(math.sin(math.pi * pulses * (now - started) / duration))
+        now = yield frame
+
+
+def thermal_source(path: str = PLATFORM_PROFILE, interval: float = 0.5):
+    """Tints the keyboard with the color of the current platform profile, read every `interval` seconds."""
+    frame = _rgba(alpha=0.0)
+    fd = os.open(path, os.O_RDONLY)
+    checked = -interval
+    try:
+        now = yield
+        while True:
+            if now - checked >= interval:
+                checked = now
+                # sysfs attributes are read again from offset 0 through the same descriptor
+                color = THERMAL_COLORS.get(os.pread(fd, 64, 0).decode().strip())
+                frame[:, 3] = 0.0 if color is None else THERMAL_ALPHA
+                if color is not None:
+                    frame[:, :3] = color
+            now = yield frame
+    finally:
+        os.close(fd)
+
+
+def reactive_source(path: str, color: tuple[int, int, int] = (255, 255, 255), decay: float = 0.4):
+    """Lights the zone of every pressed key and lets it fade over `decay` seconds."""
+    frame = _rgba(color, 0.0)
+    fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+    try:
+        last = yield
+        now = last
+        while True:
+            frame[:, 3] *= math.exp(-(now - last) / decay)
+            last = now
+            try:
+                data = os.read(fd, INPUT_EVENT.size * 64)
+            except BlockingIOError:
+                data = b""
+            for offset in range(0, len(data) - INPUT_EVENT.size + 1, INPUT_EVENT.size):
+                _sec, _usec, kind, code, value = INPUT_EVENT.unpack_from(data, offset)
+                if kind == EV_KEY and value:
+                    frame[KEY_ZONES.get(code, 1), 3] = 1.0
+            now = yield frame
+    finally:
+        os.close(fd)
+
+
+class Compositor:
+    def __init__(self, device: str | None) -> None:
+        self.layers: list[Layer] = []
+        self._device = DeviceWriter(device) if device else None
+        self._out = np.zeros((ZONE_COUNT, 3), dtype=np.float32)
+        self._tmp = np.zeros((ZONE_COUNT, 3), dtype=np.float32)
+        self._index = np.zeros((ZONE_COUNT, 3), dtype=np.intp)
+        self._corrected = np.zeros((ZONE_COUNT, 3), dtype=np.uint8)
+        # Colour correction as one flat table, channel c of value v sits at c * 256 + v
+        self._luts = np.frombuffer(b"".join(luts()), dtype=np.uint8)
+        self._lut_offsets = np.arange(3, dtype=np.intp) * 256
+        self._payloads = [bytearray(PAYLOAD_SIZE_STATIC_MODE) for _ in range(ZONE_COUNT)]
+        for zone, payload in enumerate(self._payloads):
+            payload[0] = 1 << zone
+        self._written = [None] * ZONE_COUNT
+        self.timings = np.zeros(1 << 12, dtype=np.float64)
+        self.ticks = 0
+        self.writes = 0
+        self.errors = 0
+
+    def add(self, name: str, source, priority: int | None = None) -> None:
+        """Adds a layer, replacing the one with the same name."""
+        self.remove(name)
+        next(source)
+        self.layers.append(Layer(name, PRIORITIES.get(name, 0) if priority is None else priority, source))
+        self.layers.sort(key=lambda layer: layer.priority)
+
+    def remove(self, name: str) -> bool:
+        for layer in self.layers:
+            if layer.name == name:
+                self.layers.remove(layer)
+                layer.source.close()
+                return True
+        return False
+
+    def tick(self, now: float) -> None:
+        started = time.perf_counter()
+        out, tmp = self._out, self._tmp
+        out.fill(0.0)
+        for layer in list(self.layers):
+            try:
+                rgba = layer.source.send(now)
+            except StopIteration:
+                self.layers.remove(layer)
+                continue
+            # out += (rgb - out) * alpha
+            np.subtract(rgba[:, :3], out, out=tmp)
+            np.multiply(tmp, rgba[:, 3:], out=tmp)
+            np.add(out, tmp, out=out)
+        np.rint(out, out=out)
+        np.clip(out, 0, 255, out=out)
+        np.copyto(self._index, out, casting='unsafe')
+        np.add(self._index, self._lut_offsets, out=self._index)
+        np.take(self._luts, self._index, out=self._corrected, mode='clip')
+
+        changed = False
+        for zone, payload in enumerate(self._payloads):
+            color = self._corrected[zone].tobytes()
+            if color != self._written[zone]:
+                changed = True
+                self._written[zone] = color
+                payload[1:4] = color
+                self.writes += 1
+                if self._device:
+                    try:
+                        self._device.write(payload)
+                    except OSError:
+                        self.errors += 1
+                        self._written[zone] = None
+        if not changed and self._device:
+            # An open descriptor keeps the module from being unloaded while the layers are static
+            self._device.idle()
+        self.timings[self.ticks % len(self.timings)] = time.perf_counter() - started
+        self.ticks += 1
+
+    def stats(self, budget: float) -> str:
+        count = min(self.ticks, len(self.timings))
+        if not count:
+            return "no ticks yet"
+        used = np.sort(self.timings[:count]) * 1000
+        return (f"ticks: {self.ticks} | tick budget: {budget * 1000:.2f} ms | "
+                f"cost mean: {used.mean():.3f} ms, p99: {used[int(count * 0.99)]:.3f} ms, max: {used[-1]:.3f} ms | "
+                f"zone writes: {self.writes}, errors: {self.errors} | layers: {' '.join(layer.name for layer in self.layers)}")
+
+    def close(self) -> None:
+        for layer in self.layers:
+            layer.source.close()
+        self.layers.clear()
+        if self._device:
+            self._device.close()
+
+
+def handle_command(compositor: Compositor, line: str, fps: float) -> None:
+    words = line.split()
+    if not words:
+        return
+    try:
+        if words[0] == "profile":
+            compositor.add("profile", profile_source(profile_settings(load_profile(words[1])), fps))
+        elif words[0] == "thermal":
+            compositor.add("thermal", thermal_source())
+        elif words[0] == "reactive":
+            compositor.add("reactive", reactive_source(words[1]))
+        elif words[0] == "flash":
+            color = (int(words[1]), int(words[2]), int(words[3]))
+            compositor.add("flash", flash_source(color, float(words[4]) if len(words) > 4 else 1.0))
+        elif words[0] == "remove":
+            if not compositor.remove(words[1]):
+                print(f"No layer named '{words[1]}'")
+        else:
+            print(f"Unknown command '{line.strip()}'")
+    except (IndexError, ValueError, OSError) as exc:
+        print(f"Could not run '{line.strip()}': {exc}")
+
+
+def open_control_fifo(path: str) -> tuple[int, int]:
+    if not os.path.exists(path):
+        os.mkfifo(path, 0o600)
+    read_fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+    # Our own writer keeps the FIFO from reporting end of file between commands
+    write_fd = os.open(path, os.O_WRONLY)
+    return read_fd, write_fd
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('-load', help="Saved profile used as the base layer")
+    parser.add_argument('-b', dest='brightness', type=int, default=100)
+    parser.add_argument('--fps', type=float, default=DEFAULT_FPS)
+    parser.add_argument('--thermal', action='store_true', help="Add the platform profile layer")
+    parser.add_argument('--reactive', metavar='EVDEV', help="Add the key press layer for this input device")
+    parser.add_argument('--fifo', default=CONTROL_FIFO, help="Control FIFO")
+    parser.add_argument('--dry-run', action='store_true', help="Blend only, do not write to the device")
+    args = parser.parse_args()
+
+    compositor = Compositor(None if args.dry_run else CHARACTER_DEVICE_STATIC)
+    for command, enabled in ((f"profile {args.load}", args.load), ("thermal", args.thermal),
+                             (f"reactive {args.reactive}", args.reactive)):
+        if enabled:
+            handle_command(compositor, command, args.fps)
+    if not args.dry_run:
+        write_payload(CHARACTER_DEVICE, static_mode_payload(args.brightness))
+
+    fifo, fifo_writer = open_control_fifo(args.fifo)
+    pending = b""
+    # A tick can write every zone, which the calibrated device rate has to allow
+    device_fps = min(args.fps, max_write_rate("static", args.fps * ZONE_COUNT) / ZONE_COUNT)
+    fps = device_fps
+    signal.signal(signal.SIGUSR1, lambda _signum, _frame: print(compositor.stats(1 / fps), flush=True))
+    next_tick = time.monotonic()
+    try:
+        while True:
+            if compositor.ticks % max(1, round(fps)) == 0:
+                # On battery facer_power.py caps the frame rate of software animations
+                fps = min(device_fps, frame_rate_cap(device_fps))
+            try:
+                pending += os.read(fifo, 4096)
+            except BlockingIOError:
+                pass
+            *lines, pending = pending.split(b"\n")
+            for line in lines:
+                handle_command(compositor, line.decode(errors="replace"), fps)
+            compositor.tick(time.monotonic())
+            next_tick = max(next_tick + 1 / fps, time.monotonic())
+            time.sleep(max(0.0, next_tick - time.monotonic()))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(compositor.stats(1 / fps), file=sys.stderr)
+        compositor.close()
+        os.close(fifo)
+        os.close(fifo_writer)
+        if not args.dry_run:
+            restore_state()
+
+
+if __name__ == "__main__":
+    main()
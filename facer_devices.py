@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""Discovers every keyboard device pair and applies payloads to many of them at once.
+
+The module names its nodes acer-gkbbl-N and acer-gkbbl-static-N, one pair per
+keyboard. Devices are found through their sysfs class entries (the same
+attributes udev uses to create the nodes), falling back to globbing /dev.
+"""
+import argparse
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import NamedTuple
+
+from facer_rgb import settings_payloads
+
+DYNAMIC_CLASS = "acer-gkbbl"
+STATIC_CLASS = "acer-gkbbl-static"
+MAX_WORKERS = 4
+
+
+class KeyboardDevice(NamedTuple):
+    index: int
+    dynamic: str
+    static: str | None
+
+
+class ApplyResult(NamedTuple):
+    device: KeyboardDevice
+    error: OSError | None
+    seconds: float
+
+
+def _device_nodes(class_name: str, dev_root: Path, sys_root: Path) -> dict[int, str]:
+    """Maps the instance number to its /dev node for one device class."""
+    nodes = {}
+    pattern = re.compile(rf"{re.escape(class_name)}-(\d+)$")
+    class_dir = sys_root / "class" / class_name
+    if class_dir.is_dir():
+        for entry in class_dir.iterdir():
+            match = pattern.match(entry.name)
+            if not match:
+                continue
+            devname = entry.name
+            try:
+                for line in (entry / "uevent").read_text().splitlines():
+                    if line.startswith("DEVNAME="):
+                        devname = line.split("=", 1)[1]
+            except OSError:
+                pass
+            nodes[int(match.group(1))] = str(dev_root / devname)
+    else:
+        for node in dev_root.glob(f"{class_name}-[0-9]*"):
+            match = pattern.match(node.name)
+            if match:
+                nodes[int(match.group(1))] = str(node)
+    return nodes
+
+
+def discover(dev_root: str = "/dev", sys_root: str = "/sys") -> list[KeyboardDevice]:
+    """Returns every keyboard that has at least a dynamic device, ordered by instance number."""
+    dynamic = _device_nodes(DYNAMIC_CLASS, Path(dev_root), Path(sys_root))
+    static = _device_nodes(STATIC_CLASS, Path(dev_root), Path(sys_root))
+    return [KeyboardDevice(index, dynamic[index], static.get(index)) for index in sorted(dynamic)]
+
+
+def _write_device(device: KeyboardDevice, static_payloads: list[bytes], payload: bytes) -> ApplyResult:
+    started = time.perf_counter()
+    try:
+        if static_payloads:
+            if device.static is None:
+                raise FileNotFoundError(f"Keyboard {device.index} has no static device")
+            with open(device.static, 'wb', buffering=0) as cd:
+                for static in static_payloads:
+                    cd.write(static)
+        with open(device.dynamic, 'wb', buffering=0) as cd:
+            cd.write(payload)
+        error = None
+    except OSError as exc:
+        error = exc
+    return ApplyResult(device, error, time.perf_counter() - started)
+
+
+def apply(targets: list[KeyboardDevice], payload: bytes, static_payloads: list[bytes] | None = None) -> list[ApplyResult]:
+    """Writes the same payloads to every target concurrently.
+
+    Static payloads are written first, then the 16 byte dynamic payload, so
+    each keyboard sees the same order facer_rgb.py uses. Every target gets its
+    own result, a failing keyboard does not stop the others.
+    """
+    if not targets:
+        return []
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(targets))) as pool:
+        return list(pool.map(lambda device: _write_device(device, static_payloads or [], payload), targets))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="""Applies one lighting setting to several keyboards at once.
+
+The lighting arguments are the same as facer_rgb.py's (-m, -z, -s, -b, -d, -cR, -cG, -cB),
+in static mode several zones can be given at once.
+
+Some sample commands:
+
+List the keyboards found on this machine:
+./facer_devices.py -list
+
+Wave effect on keyboards 0 and 2:
+./facer_devices.py -t 0,2 -m 3 -s 5 -b 100
+
+Blue on all zones of every keyboard:
+./facer_devices.py -m 0 -z 1 2 3 4 -cR 0 -cG 0 -cB 255
+""", formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('-list', action='store_true')
+    parser.add_argument('-t', dest='targets', default='all', help="Comma separated keyboard numbers, 'all' by default")
+    parser.add_argument('-m', type=int, dest='mode', default=3)
+    parser.add_argument('-z', type=int, dest='zones', nargs='+', default=[1])
+    parser.add_argument('-s', type=int, dest='speed', default=4)
+    parser.add_argument('-b', type=int, dest='brightness', default=100)
+    parser.add_argument('-d', type=int, dest='direction', default=1)
+    parser.add_argument('-cR', type=int, dest='red', default=50)
+    parser.add_argument('-cG', type=int, dest='green', default=255)
+    parser.add_argument('-cB', type=int, dest='blue', default=50)
+    args = parser.parse_args()
+
+    devices = discover()
+    if args.list:
+        print("Keyboards:")
+        for device in devices:
+            print(f"\t{device.index}: {device.dynamic} {device.static or '(no static device)'}")
+        exit()
+
+    if args.targets != 'all':
+        wanted = {int(index) for index in args.targets.split(',')}
+        devices = [device for device in devices if device.index in wanted]
+    if not devices:
+        print("No keyboard devices found")
+        exit(1)
+
+    static_payloads, payload = settings_payloads(args)
+    started = time.perf_counter()
+    results = apply(devices, payload, static_payloads)
+    for result in results:
+        outcome = f"failed: {result.error}" if result.error else "ok"
+        print(f"keyboard {result.device.index}: {outcome} ({result.seconds * 1000:.1f} ms)")
+    print(f"total: {(time.perf_counter() - started) * 1000:.1f} ms")
+    if any(result.error for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""Waits for the keyboard device nodes instead of failing when they are missing.
+
+The nodes disappear while the module is reloaded (service.sh, install.sh) and
+do not exist yet early during boot. wait_for_devices() blocks on inotify
+events for /dev until every node exists and is writable, with a timeout, so
+callers do not need sleep loops.
+
+DeviceWriter is meant for long-running writers. It reopens its node when a
+write fails because the module went away. Its descriptor is closed after a
+moment without writes because the module's file operations are owned by the
+module, and an open descriptor would keep rmmod from unloading it.
+
+Wait up to 30 seconds for the keyboard:
+./facer_devwatch.py -t 30
+"""
+import argparse
+import ctypes
+import errno
+import os
+import select
+import time
+
+IN_ATTRIB = 0x00000004
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+# Used when inotify cannot be set up
+FALLBACK_INTERVAL = 0.2
+# Seconds without writes after which DeviceWriter lets go of its descriptor
+IDLE_CLOSE = 2.0
+# Write errors that mean the node belongs to a module that is gone or being replaced
+RELOAD_ERRORS = {errno.ENODEV, errno.ENXIO, errno.ENOENT, errno.EIO, errno.EBADF}
+
+
+def _inotify(directories: set[str]) -> int | None:
+    """Returns an inotify descriptor watching the directories for new nodes, None if unavailable."""
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    for directory in directories:
+        # IN_ATTRIB: udev creates the node first and fixes its permissions afterwards
+        if libc.inotify_add_watch(fd, os.fsencode(directory), IN_CREATE | IN_ATTRIB | IN_MOVED_TO) < 0:
+            os.close(fd)
+            return None
+    return fd
+
+
+def devices_ready(paths: list[str]) -> bool:
+    return all(os.access(path, os.W_OK) for path in paths)
+
+
+def wait_for_devices(paths: list[str], timeout: float) -> bool:
+    """Blocks until every path exists and is writable, returns False after `timeout` seconds."""
+    if devices_ready(paths):
+        return True
+    deadline = time.monotonic() + timeout
+    fd = _inotify({os.path.dirname(path) or "." for path in paths})
+    try:
+        # Checked again once the watch is in place, the nodes may have appeared meanwhile
+        while not devices_ready(paths):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if fd is None:
+                time.sleep(min(remaining, FALLBACK_INTERVAL))
+            elif select.select([fd], [], [], remaining)[0]:
+                try:
+                    os.read(fd, 4096)
+                except BlockingIOError:
+                    pass
+        return True
+    finally:
+        if fd is not None:
+            os.close(fd)
+
+
+class DeviceWriter:
+    """Unbuffered writer for one device node that survives module reloads."""
+
+    def __init__(self, path: str, timeout: float = 0, idle_close: float = IDLE_CLOSE) -> None:
+        self.path = path
+        self.timeout = timeout
+        self.idle_close = idle_close
+        self.opens = 0
+        self._file = None
+        self._last_write = 0.0
+
+    def _open(self) -> None:
+        if not wait_for_devices([self.path], self.timeout):
+            raise FileNotFoundError(errno.ENOENT, "Device is not available", self.path)
+        self._file = open(self.path, 'wb', buffering=0)
+        self.opens += 1
+
+    def write(self, payload: bytes) -> None:
+        for attempt in range(2):
+            if self._file is None:
+                self._open()
+            try:
+                self._file.write(payload)
+                self._last_write = time.monotonic()
+                return
+            except OSError as exc:
+                self.close()
+                if attempt or exc.errno not in RELOAD_ERRORS:
+                    raise
+
+    def idle(self) -> None:
+        """Closes the descriptor if nothing was written for `idle_close` seconds, the next write reopens it."""
+        if self._file is not None and time.monotonic() - self._last_write > self.idle_close:
+            self.close()
+
+    def close(self) -> None:
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+
+def main() -> None:
+    from facer_rgb import CHARACTER_DEVICE, CHARACTER_DEVICE_STATIC
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('-t', dest='timeout', type=float, default=10, help="Seconds to wait")
+    parser.add_argument('paths', nargs='*', default=[CHARACTER_DEVICE, CHARACTER_DEVICE_STATIC])
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    if not wait_for_devices(args.paths, args.timeout):
+        print(f"Devices not available after {args.timeout:g} s: {' '.join(args.paths)}")
+        exit(1)
+    print(f"Devices ready after {(time.monotonic() - started) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Software model of the keyboard firmware effects.
+
+Renders the per-zone colours the four zones show at given timestamps for the
+six modes accepted by facer_rgb.py, so the GUI can preview effects without the
+hardware and scripts can check what a payload is expected to look like.
+The model is an approximation of what PredatorSense shows, not a dump of the
+firmware: speed maps to an effect period, direction flips the travel of Wave
+and Shifting, brightness scales the output.
+"""
+import argparse
+
+import numpy as np
+
+ZONE_COUNT = 4
+
+STATIC, BREATH, NEON, WAVE, SHIFTING, ZOOM = range(6)
+
+# Period of one effect cycle at speed 1, faster speeds divide it
+BASE_PERIOD = 12.0
+# Zone centres in [0, 1] from the leftmost to the rightmost zone
+ZONE_POSITIONS = (np.arange(ZONE_COUNT) + 0.5) / ZONE_COUNT
+
+
+def effect_phase(timestamps, speed: int) -> np.ndarray:
+    """Returns the effect phase in cycles for every timestamp; speed 0 freezes the effect."""
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    if speed <= 0:
+        return np.zeros_like(timestamps)
+    return timestamps * (speed / BASE_PERIOD)
+
+
+def hue_to_rgb(hue: np.ndarray) -> np.ndarray:
+    """Fully saturated HSV -> RGB in [0, 1] for an array of hues, adds a trailing channel axis."""
+    hue = np.asarray(hue, dtype=np.float64)[..., np.newaxis]
+    k = (np.array([5.0, 3.0, 1.0]) + hue * 6.0) % 6.0
+    return 1.0 - np.clip(np.minimum(k, 4.0 - k), 0.0, 1.0)
+
+
+def render(
+    mode: int,
+    timestamps,
+    speed: int = 4,
+    brightness: int = 100,
+    direction: int = 1,
+    color: tuple[int, int, int] = (255, 255, 255),
+    zone_colors=None,
+) -> np.ndarray:
+    """Renders one frame per timestamp.
+
+    Returns a uint8 array shaped (len(timestamps), 4, 3) holding the RGB
+    colour of every zone, left to right. `zone_colors` is only used by the
+    static mode and defaults to `color` on all four zones.
+    """
+    timestamps = np.atleast_1d(np.asarray(timestamps, dtype=np.float64))
+    phase = effect_phase(timestamps, speed)[:, np.newaxis]
+    # Direction 1 travels right to left, direction 2 left to right
+    travel = -1.0 if direction == 2 else 1.0
+    base = np.asarray(color, dtype=np.float64) / 255.0
+
+    if mode == STATIC:
+        if zone_colors is None:
+            zone_colors = [color] * ZONE_COUNT
+        frame = np.asarray(zone_colors, dtype=np.float64) / 255.0
+        frames = np.broadcast_to(frame, (len(timestamps), ZONE_COUNT, 3))
+    elif mode == BREATH:
+        level = np.broadcast_to(0.5 - 0.5 * np.cos(2 * np.pi * phase), (len(timestamps), ZONE_COUNT))
+        frames = level[..., np.newaxis] * base
+    elif mode == NEON:
+        frames = hue_to_rgb(np.broadcast_to(phase, (len(timestamps), ZONE_COUNT)))
+    elif mode == WAVE:
+        frames = hue_to_rgb(phase + travel * ZONE_POSITIONS)
+    elif mode == SHIFTING:
+        # A soft band of the colour sweeps across the zones
+        position = (travel * -phase) % 1.0
+        distance = np.abs(ZONE_POSITIONS - position)
+        distance = np.minimum(distance, 1.0 - distance)
+        level = np.clip(1.0 - distance * ZONE_COUNT, 0.0, 1.0)
+        frames = level[..., np.newaxis] * base
+    elif mode == ZOOM:
+        # Rings of the colour expanding from the centre of the keyboard
+        radius = np.abs(ZONE_POSITIONS - 0.5) * 2
+        level = 0.5 + 0.5 * np.cos(2 * np.pi * (radius - phase))
+        frames = level[..., np.newaxis] * base
+    else:
+        raise ValueError(f"Unknown effect mode {mode}")
+
+    scale = 255.0 * max(0, min(brightness, 100)) / 100
+    return np.rint(frames * scale).astype(np.uint8)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Prints the emulated zone colours of an effect, one line per frame.")
+    parser.add_argument('-m', type=int, dest='mode', default=3)
+    parser.add_argument('-s', type=int, dest='speed', default=4)
+    parser.add_argument('-b', type=int, dest='brightness', default=100)
+    parser.add_argument('-d', type=int, dest='direction', default=1)
+    parser.add_argument('-cR', type=int, dest='red', default=50)
+    parser.add_argument('-cG', type=int, dest='green', default=255)
+    parser.add_argument('-cB', type=int, dest='blue', default=50)
+    parser.add_argument('--seconds', type=float, default=2.0)
+    parser.add_argument('--fps', type=float, default=10.0)
+    args = parser.parse_args()
+
+    timestamps = np.arange(0, args.seconds, 1 / args.fps)
+    frames = render(args.mode, timestamps, args.speed, args.brightness, args.direction,
+                    (args.red, args.green, args.blue))
+    for timestamp, frame in zip(timestamps, frames):
+        zones = "  ".join("#%02x%02x%02x" % tuple(zone) for zone in frame)
+        print(f"{timestamp:7.2f}s  {zones}")
+
+
+if __name__ == "__main__":
+    main()
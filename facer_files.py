@@ -0,0 +1,16 @@
+"""File helpers shared by the facer_* tools."""
+import os
+import tempfile
+
+
+def write_atomic(path: str, text: str, mode: int = 0o644) -> None:
+    """Replaces `path` with `text` through a temp file of its own, so concurrent writers never share one."""
+    fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=f".{os.path.basename(path)}.")
+    try:
+        os.fchmod(fd, mode)
+        with open(fd, 'wt') as f:
+            f.write(text)
+        os.replace(tmp_file, path)
+    except BaseException:
+        os.unlink(tmp_file)
+        raise
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""Writes lighting and thermal metrics for the node_exporter textfile collector.
+
+Exported values:
+    predator_keyboard_mode, predator_keyboard_brightness and
+    predator_keyboard_zone_color{zone, channel}, as last written through facer_rgb.py's payloads
+    predator_fan_rpm{fan} from the module's hwmon channels
+    predator_platform_profile{profile}, 1 for the current profile, 0 for the other choices
+    predator_device_writes_total and predator_device_write_errors_total{device}
+
+The sysfs attributes are opened once and reread with pread(), and the state
+files are only parsed again when their modification time changes. The output
+file is replaced atomically (temp file + rename), and only when a value
+changed, so an idle machine costs a few syscalls per interval.
+
+Run as root with HOME pointing at the user whose lighting is exported:
+sudo HOME=/home/user ./facer_metrics.py -o /var/lib/node_exporter/textfile_collector/predator.prom
+"""
+import argparse
+import json
+import os
+import time
+
+from facer_caps import capabilities
+from facer_files import write_atomic
+from facer_rgb import PLATFORM_PROFILE, STATE_FILE, WRITE_COUNTERS_FILE
+
+DEFAULT_OUTPUT = "/var/lib/node_exporter/textfile_collector/predator.prom"
+CHANNELS = ("red", "green", "blue")
+
+
+class JsonFile:
+    """A JSON file parsed again only when its modification time changes."""
+
+    def __init__(self, path: str, default) -> None:
+        self.path = path
+        self.default = default
+        self.value = default
+        self._mtime = None
+
+    def read(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            self.value, self._mtime = self.default, None
+            return self.value
+        if mtime != self._mtime:
+            try:
+                with open(self.path, 'rt') as f:
+                    self.value = json.load(f)
+                self._mtime = mtime
+            except (OSError, ValueError):
+                # Caught in the middle of a rewrite, the next interval reads it again
+                pass
+        return self.value
+
+
+class SysfsAttribute:
+    """A sysfs attribute kept open and reread from offset 0."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._fd = None
+
+    def read(self) -> str | None:
+        try:
+            if self._fd is None:
+                self._fd = os.open(self.path, os.O_RDONLY)
+            return os.pread(self._fd, 64, 0).decode().strip()
+        except OSError:
+            # The module may have been reloaded, open the attribute again next time
+            self.close()
+            return None
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class MetricsWriter:
+    def __init__(self, output: str, state_file: str = STATE_FILE, counters_file: str = WRITE_COUNTERS_FILE,
+                 platform_profile: str = PLATFORM_PROFILE, fans: list[str] | None = None,
+                 profile_choices: list[str] | None = None) -> None:
+        caps = capabilities() if fans is None or profile_choices is None else None
+        self.output = output
+        self.state = JsonFile(state_file, {"static": {}, "dynamic": None})
+        self.counters = JsonFile(counters_file, {})
+        self.platform_profile = SysfsAttribute(platform_profile)
+        # Fans found through the capabilities are looked up again when the module's hwmon device moves
+        self._caps = caps if fans is None else None
+        self.fans = [SysfsAttribute(path) for path in (caps.fan_paths() if fans is None else fans)]
+        self.profile_choices = caps.platform_profile_choices if profile_choices is None else profile_choices
+        self._last_text = None
+        self.rewrites = 0
+
+    def collect(self) -> str:
+        lines = []
+        state = self.state.read()
+        if state.get("dynamic"):
+            payload = bytes.fromhex(state["dynamic"])
+            lines += [
+                "# HELP predator_keyboard_mode Effect mode of the last applied lighting (0 static).",
+                "# TYPE predator_keyboard_mode gauge",
+                f"predator_keyboard_mode {payload[0]}",
+                "# HELP predator_keyboard_brightness Brightness of the last applied lighting in percent.",
+                "# TYPE predator_keyboard_brightness gauge",
+                f"predator_keyboard_brightness {payload[2]}",
+                "# HELP predator_keyboard_zone_color Colour of a zone, the effect colour for zone 0.",
+                "# TYPE predator_keyboard_zone_color gauge",
+            ]
+            lines += [f'predator_keyboard_zone_color{{zone="0",channel="{channel}"}} {payload[5 + idx]}'
+                      for idx, channel in enumerate(CHANNELS)]
+            for mask, zone_payload in sorted(state["static"].items(), key=lambda item: int(item[0])):
+                zone = bytes.fromhex(zone_payload)
+                lines += [f'predator_keyboard_zone_color{{zone="{int(mask).bit_length()}",channel="{channel}"}} '
+                          f'{zone[1 + idx]}' for idx, channel in enumerate(CHANNELS)]
+
+        rpms = [(idx, fan.read()) for idx, fan in enumerate(self.fans, start=1)]
+        if self._caps is not None and (not self.fans or any(rpm is None for _idx, rpm in rpms)):
+            paths = self._caps.fan_paths()
+            if paths != [fan.path for fan in self.fans]:
+                for fan in self.fans:
+                    fan.close()
+                self.fans = [SysfsAttribute(path) for path in paths]
+                rpms = [(idx, fan.read()) for idx, fan in enumerate(self.fans, start=1)]
+        rpms = [(idx, rpm) for idx, rpm in rpms if rpm is not None]
+        if rpms:
+            lines += ["# HELP predator_fan_rpm Fan speed reported by the module.", "# TYPE predator_fan_rpm gauge"]
+            lines += [f'predator_fan_rpm{{fan="{idx}"}} {rpm}' for idx, rpm in rpms]
+
+        current = self.platform_profile.read()
+        if current is not None:
+            lines += ["# HELP predator_platform_profile Current platform profile.",
+                      "# TYPE predator_platform_profile gauge"]
+            for choice in self.profile_choices or [current]:
+                lines.append(f'predator_platform_profile{{profile="{choice}"}} {int(choice == current)}')
+
+        counters = self.counters.read()
+        if counters:
+            lines += ["# HELP predator_device_writes_total Payloads written through facer_rgb.py.",
+                      "# TYPE predator_device_writes_total counter"]
+            lines += [f'predator_device_writes_total{{device="{device}"}} {values.get("writes", 0)}'
+                      for device, values in sorted(counters.items())]
+            lines += ["# HELP predator_device_write_errors_total Failed payload writes through facer_rgb.py.",
+                      "# TYPE predator_device_write_errors_total counter"]
+            lines += [f'predator_device_write_errors_total{{device="{device}"}} {values.get("errors", 0)}'
+                      for device, values in sorted(counters.items())]
+        return "\n".join(lines) + "\n"
+
+    def update(self) -> bool:
+        """Collects the metrics and rewrites the output if anything changed, returns True when it did."""
+        text = self.collect()
+        if text == self._last_text:
+            return False
+        write_atomic(self.output, text)
+        self._last_text = text
+        self.rewrites += 1
+        return True
+
+    def close(self) -> None:
+        self.platform_profile.close()
+        for fan in self.fans:
+            fan.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('-o', dest='output', default=DEFAULT_OUTPUT, help="Textfile collector file to write")
+    parser.add_argument('-i', dest='interval', type=float, default=15, help="Seconds between updates")
+    parser.add_argument('--once', action='store_true', help="Write the metrics once and exit")
+    args = parser.parse_args()
+
+    writer = MetricsWriter(args.output)
+    try:
+        writer.update()
+        while not args.once:
+            time.sleep(args.interval)
+            writer.update()
+    except KeyboardInterrupt:
+        print(f"rewrites: {writer.rewrites}")
+    finally:
+        writer.close()
+
+
+if __name__ == "__main__":
+    main()
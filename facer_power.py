@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""Dims the keyboard lighting while the laptop runs on battery.
+
+Power supply changes are taken from kernel uevents (netlink), so the process
+sleeps until the charger is plugged or unplugged, or the battery driver reports
+a new capacity. On battery the last applied lighting (see facer_rgb.py
+--restore) is rewritten with the low-power settings from
+~/.config/predator/power.json; back on AC the original lighting is restored.
+Software animations read the frame rate cap from frame_rate_cap().
+"""
+import argparse
+import json
+import select
+import socket
+from pathlib import Path
+from typing import NamedTuple
+
+from facer_files import write_atomic
+from facer_rgb import (
+    CHARACTER_DEVICE,
+    CHARACTER_DEVICE_STATIC,
+    apply_settings,
+    load_profile,
+    load_state,
+    profile_settings,
+    restore_state,
+    static_mode_payload,
+    static_payload,
+    write_payload,
+)
+
+POWER_CONFIG_FILE = str(Path.home()) + "/.config/predator/power.json"
+# Written on every switch, read by software animations for their frame rate cap
+POWER_STATE_FILE = str(Path.home()) + "/.config/predator/power_state.json"
+
+DEFAULT_CONFIG = {
+    # Brightness is capped to this value on battery
+    "battery_brightness": 30,
+    # Firmware effects run at most at this speed on battery
+    "battery_speed": 1,
+    # Replace animated effects by a static color on battery
+    "battery_static": False,
+    # Saved profile used on battery instead of dimming the current lighting
+    "battery_profile": None,
+    # Frame rate cap for software animations on battery
+    "battery_max_fps": 10,
+    # Below this capacity (percent) the backlight is switched off
+    "critical_capacity": 10,
+}
+
+NETLINK_KOBJECT_UEVENT = 15
+
+
+class PowerState(NamedTuple):
+    on_ac: bool
+    capacity: int | None
+
+
+def read_power_state(sys_root: str = "/sys") -> PowerState:
+    """Reads the power_supply class; machines without a mains supply count as being on AC."""
+    mains_seen = False
+    on_ac = False
+    capacities = []
+    for supply in sorted(Path(sys_root, "class", "power_supply").glob("*")):
+        try:
+            supply_type = (supply / "type").read_text().strip()
+        except OSError:
+            continue
+        try:
+            if supply_type == "Battery":
+                capacities.append(int((supply / "capacity").read_text()))
+            elif supply_type in ("Mains", "USB"):
+                mains_seen = True
+                on_ac |= (supply / "online").read_text().strip() == "1"
+        except (OSError, ValueError):
+            continue
+    return PowerState(on_ac or not mains_seen, min(capacities) if capacities else None)
+
+
+def load_config() -> dict:
+    config = dict(DEFAULT_CONFIG)
+    try:
+        with open(POWER_CONFIG_FILE, 'rt') as f:
+            config.update(json.load(f))
+    except FileNotFoundError:
+        pass
+    return config
+
+
+def frame_rate_cap(default: float) -> float:
+    """Returns the frame rate software animations should not exceed right now."""
+    try:
+        with open(POWER_STATE_FILE, 'rt') as f:
+            max_fps = json.load(f).get("max_fps")
+    except (FileNotFoundError, ValueError):
+        return default
+    return min(default, max_fps) if max_fps else default
+
+
+def _write_power_state(power: PowerState, max_fps: float | None) -> None:
+    state = {"on_ac": power.on_ac, "capacity": power.capacity, "max_fps": max_fps}
+    write_atomic(POWER_STATE_FILE, json.dumps(state, indent=4))
+
+
+def apply_battery_lighting(config: dict, capacity: int | None) -> None:
+    """Writes the low-power lighting without recording it as the last state."""
+    critical = capacity is not None and capacity <= config["critical_capacity"]
+    brightness_cap = 0 if critical else config["battery_brightness"]
+
+    if config["battery_profile"] and not critical:
+        settings = profile_settings(load_profile(config["battery_profile"]))
+        settings.brightness = min(settings.brightness, brightness_cap)
+        apply_settings(settings, record=False)
+        return
+
+    state = load_state()
+    if not state["dynamic"]:
+        return
+    payload = bytearray.fromhex(state["dynamic"])
+    if payload[0] != 0 and config["battery_static"] and not critical:
+        # Freeze the effect to its own color on all four zones
+        for zone in range(1, 5):
+            write_payload(CHARACTER_DEVICE_STATIC, static_payload(zone, payload[5], payload[6], payload[7]))
+        write_payload(CHARACTER_DEVICE, static_mode_payload(min(payload[2], brightness_cap)))
+        return
+    payload[1] = min(payload[1], config["battery_speed"])
+    payload[2] = min(payload[2], brightness_cap)
+    write_payload(CHARACTER_DEVICE, bytes(payload))
+
+
+class PowerWatcher:
+    def __init__(self, sys_root: str = "/sys", config: dict | None = None) -> None:
+        self.sys_root = sys_root
+        self.config = config or load_config()
+        self.state: PowerState | None = None
+        # A previous run may have left the battery lighting applied
+        try:
+            with open(POWER_STATE_FILE, 'rt') as f:
+                self.on_battery_lighting = not json.load(f).get("on_ac", True)
+        except (FileNotFoundError, ValueError):
+            self.on_battery_lighting = False
+
+    def check(self) -> bool:
+        """Rereads the power supplies and switches the lighting if needed, returns True when it switched."""
+        power = read_power_state(self.sys_root)
+        if power == self.state:
+            return False
+        previous, self.state = self.state, power
+        critical = power.capacity is not None and power.capacity <= self.config["critical_capacity"]
+        was_critical = (previous is not None and previous.capacity is not None
+                        and previous.capacity <= self.config["critical_capacity"])
+
+        if power.on_ac:
+            _write_power_state(power, None)
+            if self.on_battery_lighting:
+                restore_state()
+                self.on_battery_lighting = False
+                return True
+            return False
+
+        _write_power_state(power, self.config["battery_max_fps"])
+        if not self.on_battery_lighting or critical != was_critical:
+            apply_battery_lighting(self.config, power.capacity)
+            self.on_battery_lighting = True
+            return True
+        return False
+
+    def run(self) -> None:
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+        sock.bind((0, 1))
+        self.check()
+        poller = select.poll()
+        poller.register(sock, select.POLLIN)
+        while True:
+            poller.poll()
+            message = sock.recv(8192)
+            if b"SUBSYSTEM=power_supply" in message:
+                try:
+                    self.check()
+                except OSError as exc:
+                    print(f"Could not update the lighting: {exc}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=f"""Switches to low-power keyboard lighting on battery and back on AC.
+
+Settings are read from '{POWER_CONFIG_FILE}', defaults:
+{json.dumps(DEFAULT_CONFIG, indent=4)}
+""", formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--sys-root', default='/sys', help="Root of the sysfs tree to read power supplies from")
+    parser.add_argument('--once', action='store_true', help="Apply the lighting for the current power source and exit")
+    args = parser.parse_args()
+
+    watcher = PowerWatcher(args.sys_root)
+    if args.once:
+        watcher.check()
+        print("on AC" if watcher.state.on_ac else f"on battery ({watcher.state.capacity}%)")
+        return
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,18 @@
 #!/usr/bin/env python3
 import argparse
+import fcntl
 import json
+import os
+import time
+from contextlib import ExitStack, contextmanager
 from pathlib import Path
 
+from facer_calibrate import max_write_rate
+from facer_caps import capabilities
+from facer_color import correct
+from facer_devwatch import wait_for_devices
+from facer_files import write_atomic
+
 PAYLOAD_SIZE = 16
 CHARACTER_DEVICE = "/dev/acer-gkbbl-0"
 
@@ -13,6 +23,17 @@ CONFIG_DIRECTORY = str(Path.home()) + "/.config/predator/saved profiles"
 path = Path(CONFIG_DIRECTORY)
 path.mkdir(parents=True, exist_ok=True)
 
+# Last payloads written to the devices, replayed by --restore
+STATE_FILE = str(Path.home()) + "/.config/predator/last_state.json"
+# Writes and failed writes per device through write_payload, exported by facer_metrics.py
+WRITE_COUNTERS_FILE = str(Path.home()) + "/.config/predator/write_counters.json"
+
+# Current thermal profile, written by the module and the mode key
+PLATFORM_PROFILE = "/sys/firmware/acpi/platform_profile"
+
+# Frames per second written during -transition cross-fades
+TRANSITION_FPS = 30
+
 parser = argparse.ArgumentParser(description=f"""Interacts with experimental Acer-wmi kernel module.
 -m [mode index]
     Effect modes:
@@ -77,6 +98,17 @@ parser = argparse.ArgumentParser(description=f"""Interacts with experimental Ace
     Lists all the saved profiles in config directory
     config directory is '{CONFIG_DIRECTORY}'
 
+--restore
+    Writes the last applied lighting state again
+    state is kept in '{STATE_FILE}'
+
+-transition [seconds]
+    Cross-fades from the last applied lighting instead of switching at once
+
+-wait [seconds]
+    Waits up to that long for the device nodes (module still loading or
+    being reloaded) instead of failing right away
+
 Some sample commands:
 
 Breath effect with Purple color(speed=4, brightness=100):
@@ -99,6 +131,15 @@ Static waving (speed=0) and save it as example:
 
 Load the previously saved profile:
 ./facer_rgb.py -load example
+
+Load the previously saved profile, fading over 1.5 seconds:
+./facer_rgb.py -load example -transition 1.5
+
+Restore the last applied lighting (e.g. from a login hook):
+./facer_rgb.py --restore
+
+Restore it as soon as the module is loaded, giving up after 30 seconds:
+./facer_rgb.py --restore -wait 30
 """, formatter_class=argparse.RawTextHelpFormatter)
 
 parser.add_argument('-m',
@@ -148,59 +189,342 @@ parser.add_argument('-load')
 parser.add_argument('-list',
                     action='store_true')
 
-args = parser.parse_args()
+parser.add_argument('-restore', '--restore',
+                    action='store_true')
 
-if args.list:
-    print("Saved profiles:")
-    for filepath in list(path.glob('*.*')): print(f"\t{filepath.stem}")
-    exit()
+parser.add_argument('-transition',
+                    type=float,
+                    default=0)
 
-if args.load:
-    with open(f"{CONFIG_DIRECTORY}/{args.load}.json", 'rt') as f:
-        t_args = argparse.Namespace()
-        t_args.__dict__.update(json.load(f))
-        args = parser.parse_args(namespace=t_args)
+parser.add_argument('-wait',
+                    type=float,
+                    default=0)
 
-if args.save:
-    with open(f"{CONFIG_DIRECTORY}/{args.save}.json", 'wt') as f:
-        vars(args).pop('save')
-        vars(args).pop('load')
-        json.dump(vars(args), f, indent=4)
 
-if args.mode == 0:
-    # Static coloring mode
+def static_payload(zone: int, red: int, green: int, blue: int) -> bytes:
     payload = [0] * PAYLOAD_SIZE_STATIC_MODE
-    if args.zone < 1 or args.zone > 8:
-        print("Invalid Zone ID entered! Possible values are: 1, 2, 3, 4 from left to right")
-    payload[0] = 1 << (args.zone - 1)
-    payload[1] = args.red
-    payload[2] = args.green
-    payload[3] = args.blue
-    with open(CHARACTER_DEVICE_STATIC, 'wb') as cd:
-        cd.write(bytes(payload))
+    payload[0] = 1 << (zone - 1)
+    payload[1] = red
+    payload[2] = green
+    payload[3] = blue
+    return bytes(payload)
 
-    # Tell WMI To use STATIC coloring
-    # Dynamic coloring mode
+
+def dynamic_payload(mode: int, speed: int, brightness: int, direction: int, red: int, green: int, blue: int) -> bytes:
     payload = [0] * PAYLOAD_SIZE
-    payload[2] = args.brightness
+    payload[0] = mode
+    payload[1] = speed
+    payload[2] = brightness
+    payload[3] = 8 if mode == 3 else 0
+    payload[4] = direction
+    payload[5] = red
+    payload[6] = green
+    payload[7] = blue
     payload[9] = 1
-    with open(CHARACTER_DEVICE, 'wb') as cd:
-        cd.write(bytes(payload))
-
+    return bytes(payload)
 
 
-else:
-    # Dynamic coloring mode
+def static_mode_payload(brightness: int) -> bytes:
+    # Tell WMI To use STATIC coloring
     payload = [0] * PAYLOAD_SIZE
-    payload[0] = args.mode
-    payload[1] = args.speed
-    payload[2] = args.brightness
-    payload[3] = 8 if args.mode == 3 else 0
-    payload[4] = args.direction
-    payload[5] = args.red
-    payload[6] = args.green
-    payload[7] = args.blue
+    payload[2] = brightness
     payload[9] = 1
-
-    with open(CHARACTER_DEVICE, 'wb') as cd:
-        cd.write(bytes(payload))
+    return bytes(payload)
+
+
+def _count_write(device: str, counter: str) -> None:
+    # Shared by every process writing payloads, so the file is updated under a lock
+    try:
+        fd = os.open(WRITE_COUNTERS_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+    except OSError:
+        return
+    try:
+        if os.geteuid() == 0:
+            # --restore runs as root with the user's HOME, the file must stay writable for the user
+            owner = os.stat(os.path.dirname(WRITE_COUNTERS_FILE))
+            if os.fstat(fd).st_uid != owner.st_uid:
+                os.fchown(fd, owner.st_uid, owner.st_gid)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        raw = os.pread(fd, 65536, 0)
+        try:
+            counters = json.loads(raw) if raw else {}
+        except ValueError:
+            counters = {}
+        device_counters = counters.setdefault(device, {"writes": 0, "errors": 0})
+        device_counters[counter] = device_counters.get(counter, 0) + 1
+        data = json.dumps(counters).encode()
+        os.ftruncate(fd, 0)
+        os.pwrite(fd, data, 0)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def write_payload(device: str, payload: bytes) -> None:
+    try:
+        with open(device, 'wb') as cd:
+            cd.write(payload)
+    except OSError:
+        _count_write(device, "errors")
+        raise
+    _count_write(device, "writes")
+
+
+def load_state() -> dict:
+    """Returns the last applied payloads as hex strings.
+
+    'static' maps the zone bitmask to its 4 byte payload, 'dynamic' holds the
+    16 byte payload or None when nothing was applied yet.
+    """
+    try:
+        with open(STATE_FILE, 'rt') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {"static": {}, "dynamic": None}
+
+
+def save_state(state: dict) -> None:
+    write_atomic(STATE_FILE, json.dumps(state, indent=4))
+
+
+@contextmanager
+def state_lock():
+    """Serialises load_state()/save_state() round trips between processes."""
+    # Opened read-only so a lock file created by root can still be locked by the user
+    fd = os.open(STATE_FILE + ".lock", os.O_RDONLY | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+def apply_static(zones: list[int], red: int, green: int, blue: int, brightness: int) -> None:
+    red, green, blue = correct(red, green, blue)
+    with state_lock():
+        state = load_state()
+        for zone in zones:
+            payload = static_payload(zone, red, green, blue)
+            write_payload(CHARACTER_DEVICE_STATIC, payload)
+            state["static"][str(payload[0])] = payload.hex()
+        payload = static_mode_payload(brightness)
+        write_payload(CHARACTER_DEVICE, payload)
+        state["dynamic"] = payload.hex()
+        save_state(state)
+
+
+def apply_dynamic(mode: int, speed: int, brightness: int, direction: int, red: int, green: int, blue: int) -> None:
+    red, green, blue = correct(red, green, blue)
+    payload = dynamic_payload(mode, speed, brightness, direction, red, green, blue)
+    write_payload(CHARACTER_DEVICE, payload)
+    with state_lock():
+        state = load_state()
+        state["dynamic"] = payload.hex()
+        save_state(state)
+
+
+def restore_state() -> bool:
+    """Replays the last applied payloads, returns False if there is nothing to restore."""
+    state = load_state()
+    if not state["dynamic"]:
+        return False
+    dynamic = bytes.fromhex(state["dynamic"])
+    if dynamic[0] == 0:
+        # Zone colors only matter when the keyboard is in static mode
+        for payload in state["static"].values():
+            write_payload(CHARACTER_DEVICE_STATIC, bytes.fromhex(payload))
+    write_payload(CHARACTER_DEVICE, dynamic)
+    return True
+
+
+def load_profile(name: str) -> dict:
+    with open(f"{CONFIG_DIRECTORY}/{name}.json", 'rt') as f:
+        return json.load(f)
+
+
+def profile_settings(profile: dict) -> argparse.Namespace:
+    """Normalises a profile saved with -save or by keyboard_gui.py.
+
+    Missing values take the command line defaults; `zones` lists the zones
+    colored in static mode.
+    """
+    settings = parser.parse_args([])
+    for key in ('mode', 'zone', 'speed', 'brightness', 'direction', 'red', 'green', 'blue'):
+        if key in profile:
+            setattr(settings, key, int(profile[key]))
+    zones = profile.get('zones')
+    if profile.get('zone_mode') == 'whole':
+        settings.zones = [1, 2, 3, 4]
+    elif isinstance(zones, dict):
+        settings.zones = [int(zone) for zone, enabled in zones.items() if int(enabled)] or [1, 2, 3, 4]
+    else:
+        settings.zones = [settings.zone]
+    return settings
+
+
+def settings_payloads(settings: argparse.Namespace) -> tuple[list[bytes], bytes]:
+    """Returns the static zone payloads and the dynamic payload for the settings, colors corrected."""
+    red, green, blue = correct(settings.red, settings.green, settings.blue)
+    if settings.mode == 0:
+        return ([static_payload(zone, red, green, blue) for zone in settings.zones],
+                static_mode_payload(settings.brightness))
+    return [], dynamic_payload(settings.mode, settings.speed, settings.brightness, settings.direction,
+                               red, green, blue)
+
+
+def apply_settings(settings: argparse.Namespace, record: bool = True) -> None:
+    """Writes the settings to the keyboard.
+
+    With record=False the last state is left alone, for previews and for
+    lighting that is only shown until --restore brings back the user's own.
+    """
+    if not record:
+        static_payloads, payload = settings_payloads(settings)
+        for static in static_payloads:
+            write_payload(CHARACTER_DEVICE_STATIC, static)
+        write_payload(CHARACTER_DEVICE, payload)
+    elif settings.mode == 0:
+        apply_static(settings.zones, settings.red, settings.green, settings.blue, settings.brightness)
+    else:
+        apply_dynamic(settings.mode, settings.speed, settings.brightness, settings.direction,
+                      settings.red, settings.green, settings.blue)
+
+
+def _with_brightness(payload: bytes, brightness: int) -> bytes:
+    return payload[:2] + bytes([brightness]) + payload[3:]
+
+
+def transition_frames(settings: argparse.Namespace, frame_count: int) -> list[tuple[list[bytes], bytes]]:
+    """Precomputes the frames fading from the last applied lighting to the settings.
+
+    Every frame holds the payloads of all four static zones (empty while a
+    firmware effect runs) and the dynamic payload; the last frame is the
+    target itself. Between two static colorings each zone fades to its new
+    color. When a firmware effect is involved the old lighting is dimmed to
+    off during the first half and the new one brought up during the second.
+    """
+    state = load_state()
+    static_payloads, payload = settings_payloads(settings)
+    if not state["dynamic"]:
+        return [(static_payloads, payload)]
+    source = bytes.fromhex(state["dynamic"])
+    source_zones = {int(mask): bytes.fromhex(zone) for mask, zone in state["static"].items()}
+    target_zones = dict(source_zones)
+    target_zones.update({zone[0]: zone for zone in static_payloads})
+
+    frames = []
+    for idx in range(1, frame_count + 1):
+        t = idx / frame_count
+        if source[0] == 0 and payload[0] == 0:
+            zones = []
+            for mask, target in sorted(target_zones.items()):
+                start = source_zones.get(mask, target)
+                if start != target:
+                    zones.append(bytes([mask] + [round(a + (b - a) * t) for a, b in zip(start[1:], target[1:])]))
+            frames.append((zones, _with_brightness(payload, round(source[2] + (payload[2] - source[2]) * t))))
+        elif t <= 0.5:
+            frames.append(([], _with_brightness(source, round(source[2] * (1 - 2 * t)))))
+        else:
+            zones = sorted(target_zones.values()) if payload[0] == 0 else []
+            frames.append((zones, _with_brightness(payload, round(payload[2] * (2 * t - 1)))))
+    return frames
+
+
+def play_frames(frames: list[tuple[list[bytes], bytes]], fps: int = TRANSITION_FPS) -> int:
+    """Streams the frames at the given rate, returns how many were written.
+
+    Frame N is due N / fps seconds after the start. When writes fall behind,
+    the frames whose time has already passed are dropped so the last one is
+    still written on time; only payloads that changed are written.
+    """
+    written_zones: dict[int, bytes] = {}
+    written_payload = None
+    written = 0
+    last = len(frames) - 1
+    with ExitStack() as stack:
+        # Models without the static device only ever get dynamic payloads
+        if any(zones for zones, _ in frames):
+            static_device = stack.enter_context(open(CHARACTER_DEVICE_STATIC, 'wb', buffering=0))
+        dynamic_device = stack.enter_context(open(CHARACTER_DEVICE, 'wb', buffering=0))
+        started = time.monotonic()
+        idx = 0
+        while True:
+            zones, payload = frames[idx]
+            for zone in zones:
+                if written_zones.get(zone[0]) != zone:
+                    static_device.write(zone)
+                    written_zones[zone[0]] = zone
+            if payload != written_payload:
+                dynamic_device.write(payload)
+                written_payload = payload
+            written += 1
+            if idx == last:
+                break
+            elapsed = time.monotonic() - started
+            idx = max(idx + 1, min(int(elapsed * fps), last))
+            time.sleep(max(0.0, idx / fps - elapsed))
+    return written
+
+
+def apply_transition(settings: argparse.Namespace, duration: float, fps: int = TRANSITION_FPS) -> tuple[int, int]:
+    """Cross-fades to the settings and records them, returns the frames planned and written."""
+    # A static frame can take one write per zone plus one on the dynamic device
+    fps = min(fps, max_write_rate("dynamic", fps), max_write_rate("static", fps * 4) / 4)
+    frames = transition_frames(settings, max(1, round(duration * fps)))
+    written = play_frames(frames[:-1], fps) if len(frames) > 1 else 0
+    # The target itself goes through apply_settings so it is recorded like any other change
+    time.sleep(max(0.0, duration / len(frames)))
+    apply_settings(settings)
+    return len(frames), written + 1
+
+
+def main() -> None:
+    args = parser.parse_args()
+
+    if args.wait and not args.list and not wait_for_devices([CHARACTER_DEVICE, CHARACTER_DEVICE_STATIC], args.wait):
+        print(f"Keyboard devices did not appear within {args.wait:g} seconds")
+        exit(1)
+
+    if not args.list and not capabilities().dynamic_device:
+        print("No keyboard device found, is the module loaded? (./facer_caps.py --refresh shows what was found)")
+        exit(1)
+
+    if args.restore:
+        if not restore_state():
+            print(f"No lighting state saved in '{STATE_FILE}' yet")
+        exit()
+
+    if args.list:
+        print("Saved profiles:")
+        for filepath in list(path.glob('*.*')): print(f"\t{filepath.stem}")
+        exit()
+
+    if args.load:
+        with open(f"{CONFIG_DIRECTORY}/{args.load}.json", 'rt') as f:
+            t_args = argparse.Namespace()
+            t_args.__dict__.update(json.load(f))
+            args = parser.parse_args(namespace=t_args)
+
+    if args.save:
+        with open(f"{CONFIG_DIRECTORY}/{args.save}.json", 'wt') as f:
+            # Options that only steer this run are not part of the profile
+            json.dump({key: value for key, value in vars(args).items()
+                       if key not in ('save', 'load', 'restore', 'transition', 'wait')}, f, indent=4)
+
+    if args.transition > 0:
+        started = time.monotonic()
+        planned, written = apply_transition(profile_settings(vars(args)), args.transition)
+        print(f"Transition: {written}/{planned} frames written in {(time.monotonic() - started) * 1000:.0f} ms")
+    elif args.mode == 0:
+        # Static coloring mode
+        if args.zone < 1 or args.zone > 8:
+            print("Invalid Zone ID entered! Possible values are: 1, 2, 3, 4 from left to right")
+        apply_static([args.zone], args.red, args.green, args.blue, args.brightness)
+    else:
+        # Dynamic coloring mode
+        apply_dynamic(args.mode, args.speed, args.brightness, args.direction, args.red, args.green, args.blue)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""Applies saved profiles on a weekly schedule.
+
+Rules are read from ~/.config/predator/schedule.json, for example:
+
+    [
+        {"profile": "work", "time": "09:00", "days": "mon-fri"},
+        {"profile": "night", "time": "22:30"},
+        {"profile": "weekend", "time": "10:00", "days": "sat,sun"}
+    ]
+
+Every rule has one entry in a min-heap ordered by its next fire time, and
+the process sleeps until the earliest entry is due, so it only wakes up when
+a profile has to be applied. A wake-up where the wall clock moved more than
+the monotonic clock (clock change, suspend/resume) rebuilds the heap and
+applies the rule that should be active at the new time.
+"""
+import argparse
+import heapq
+import json
+import os
+import signal
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import NamedTuple
+
+from facer_rgb import apply_settings, load_profile, profile_settings
+
+SCHEDULE_FILE = str(Path.home()) + "/.config/predator/schedule.json"
+DAY_NAMES = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+# Wall and monotonic clocks drifting apart by more than this over one sleep count as a clock jump
+JUMP_TOLERANCE = 2.0
+# Without timerfd a sleep across suspend is measured on the monotonic clock, which stops while
+# suspended, so sleeps are capped to notice resumes at least this often
+MAX_IDLE_SLEEP = 3600.0
+
+
+class Rule(NamedTuple):
+    profile: str
+    hour: int
+    minute: int
+    days: frozenset[int]
+
+
+def parse_days(spec: str) -> frozenset[int]:
+    """Parses 'daily', 'mon-fri', 'sat,sun' or combinations like 'mon,wed-fri'."""
+    if spec in ("daily", "*", ""):
+        return frozenset(range(7))
+    days = set()
+    for part in spec.lower().split(","):
+        first, _, last = part.strip().partition("-")
+        start = DAY_NAMES.index(first)
+        end = DAY_NAMES.index(last) if last else start
+        days.update((start + offset) % 7 for offset in range((end - start) % 7 + 1))
+    return frozenset(days)
+
+
+def load_rules(path: str = SCHEDULE_FILE) -> list[Rule]:
+    with open(path, 'rt') as f:
+        entries = json.load(f)
+    rules = []
+    for entry in entries:
+        hour, minute = (int(value) for value in entry["time"].split(":"))
+        rules.append(Rule(entry["profile"], hour, minute, parse_days(entry.get("days", "daily"))))
+    return rules
+
+
+def next_fire(rule: Rule, now: float) -> float:
+    """Returns the first fire time of the rule strictly after `now`."""
+    today = datetime.fromtimestamp(now).replace(hour=rule.hour, minute=rule.minute, second=0, microsecond=0)
+    for offset in range(8):
+        candidate = today + timedelta(days=offset)
+        if candidate.weekday() in rule.days and candidate.timestamp() > now:
+            return candidate.timestamp()
+    raise ValueError(f"Rule for '{rule.profile}' has no days")
+
+
+def previous_fire(rule: Rule, now: float) -> float:
+    """Returns the last fire time of the rule at or before `now`."""
+    today = datetime.fromtimestamp(now).replace(hour=rule.hour, minute=rule.minute, second=0, microsecond=0)
+    for offset in range(8):
+        candidate = today - timedelta(days=offset)
+        if candidate.weekday() in rule.days and candidate.timestamp() <= now:
+            return candidate.timestamp()
+    raise ValueError(f"Rule for '{rule.profile}' has no days")
+
+
+class Scheduler:
+    def __init__(self, rules: list[Rule], apply=None) -> None:
+        self.rules = rules
+        self.apply = apply or (lambda profile: apply_settings(profile_settings(load_profile(profile))))
+        self.heap: list[tuple[float, int]] = []
+        self.started = time.monotonic()
+        self.wakeups = 0
+        self.idle_wakeups = 0
+        self.clock_jumps = 0
+        self._timer = None
+        if hasattr(os, "timerfd_create"):
+            # Absolute CLOCK_REALTIME timers keep running through suspend and are cancelled by clock changes
+            self._timer = os.timerfd_create(time.CLOCK_REALTIME)
+
+    def rebuild(self, now: float) -> None:
+        self.heap = [(next_fire(rule, now), idx) for idx, rule in enumerate(self.rules)]
+        heapq.heapify(self.heap)
+
+    def apply_current(self, now: float) -> None:
+        """Applies the rule that fired last before `now`, used at start and after clock jumps."""
+        if not self.rules:
+            return
+        _fired_at, idx = max((previous_fire(rule, now), idx) for idx, rule in enumerate(self.rules))
+        self._apply(idx)
+
+    def _apply(self, idx: int) -> None:
+        profile = self.rules[idx].profile
+        try:
+            self.apply(profile)
+            print(f"Applied profile '{profile}'")
+        except (OSError, ValueError) as exc:
+            print(f"Could not apply profile '{profile}': {exc}")
+
+    def _sleep_until(self, deadline: float) -> bool:
+        """Sleeps until the wall clock reaches `deadline`, returns False if the clock was changed meanwhile."""
+        if self._timer is not None:
+            os.timerfd_settime(self._timer, flags=os.TFD_TIMER_ABSTIME | os.TFD_TIMER_CANCEL_ON_SET,
+                               initial=deadline)
+            try:
+                os.read(self._timer, 8)
+            except OSError:
+                # ECANCELED: the realtime clock was set
+                return False
+            return True
+        delay = deadline - time.time()
+        if delay > 0:
+            time.sleep(min(delay, MAX_IDLE_SLEEP))
+        return True
+
+    def step(self) -> None:
+        """Sleeps until the earliest rule is due and applies the rules that fired."""
+        deadline = self.heap[0][0]
+        wall, mono = time.time(), time.monotonic()
+        undisturbed = self._sleep_until(deadline)
+        now = time.time()
+        self.wakeups += 1
+
+        drift = (now - wall) - (time.monotonic() - mono)
+        if not undisturbed or abs(drift) > JUMP_TOLERANCE:
+            self.clock_jumps += 1
+            self.rebuild(now)
+            self.apply_current(now)
+            return
+
+        fired = None
+        while self.heap and self.heap[0][0] <= now:
+            _fire_at, idx = heapq.heappop(self.heap)
+            heapq.heappush(self.heap, (next_fire(self.rules[idx], now), idx))
+            fired = idx
+        if fired is None:
+            self.idle_wakeups += 1
+        else:
+            self._apply(fired)
+
+    def stats(self) -> str:
+        hours = max((time.monotonic() - self.started) / 3600, 1e-9)
+        return (f"wakeups: {self.wakeups}, idle wakeups: {self.idle_wakeups} "
+                f"({self.idle_wakeups / hours:.2f}/hour), clock jumps: {self.clock_jumps}")
+
+    def run(self) -> None:
+        now = time.time()
+        self.rebuild(now)
+        self.apply_current(now)
+        while self.heap:
+            self.step()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('-c', dest='config', default=SCHEDULE_FILE, help="Schedule file")
+    parser.add_argument('-list', action='store_true', help="Lists the rules ordered by their next fire time")
+    args = parser.parse_args()
+
+    rules = load_rules(args.config)
+    scheduler = Scheduler(rules)
+    if args.list:
+        scheduler.rebuild(time.time())
+        for fire_at, idx in sorted(scheduler.heap):
+            print(f"\t{datetime.fromtimestamp(fire_at):%a %Y-%m-%d %H:%M} -> {rules[idx].profile}")
+        return
+
+    # kill -USR1 <pid> prints the wakeup counters
+    signal.signal(signal.SIGUSR1, lambda _signum, _frame: print(scheduler.stats(), flush=True))
+    try:
+        scheduler.run()
+    except KeyboardInterrupt:
+        print(scheduler.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Changes the keyboard lighting with the thermal profile.
+
+When the mode key cycles the thermal profile the module calls
+platform_profile_notify(), which wakes up poll() on
+/sys/firmware/acpi/platform_profile with POLLPRI. The watcher sleeps in
+poll() without any timer, rereads the profile when woken up and applies the
+lighting mapped to it. Profiles without a mapping bring back the last applied
+lighting (facer_rgb.py --restore). The time from the wake-up to the written
+payload is printed for every change.
+
+Mappings are read from ~/.config/predator/thermal.json. A value is either the
+name of a saved profile or profile settings, e.g.
+
+    {"performance": {"mode": 0, "red": 255, "green": 0, "blue": 0}, "quiet": "night"}
+
+Regular files never signal POLLPRI, so to test without the hardware point
+--profile-path at a plain file and trigger a reread through a FIFO:
+
+    ./facer_thermal.py --profile-path /tmp/platform_profile --trigger /tmp/thermal.notify
+    echo performance > /tmp/platform_profile; echo > /tmp/thermal.notify
+"""
+import argparse
+import json
+import os
+import select
+import time
+from pathlib import Path
+
+from facer_rgb import PLATFORM_PROFILE, apply_settings, load_profile, profile_settings, restore_state
+
+THERMAL_CONFIG_FILE = str(Path.home()) + "/.config/predator/thermal.json"
+
+DEFAULT_CONFIG = {
+    "performance": {"mode": 0, "zone_mode": "whole", "red": 255, "green": 0, "blue": 0},
+    "balanced-performance": {"mode": 0, "zone_mode": "whole", "red": 255, "green": 120, "blue": 0},
+    "quiet": {"mode": 0, "zone_mode": "whole", "red": 0, "green": 80, "blue": 255},
+    "low-power": {"mode": 0, "zone_mode": "whole", "red": 0, "green": 80, "blue": 255},
+}
+
+
+def load_config() -> dict:
+    try:
+        with open(THERMAL_CONFIG_FILE, 'rt') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return dict(DEFAULT_CONFIG)
+
+
+def apply_thermal_lighting(mapping) -> None:
+    # Not recorded as the last state, so the user's own lighting can be restored afterwards
+    profile = load_profile(mapping) if isinstance(mapping, str) else mapping
+    apply_settings(profile_settings(profile), record=False)
+
+
+class ThermalWatcher:
+    def __init__(self, config: dict | None = None, path: str = PLATFORM_PROFILE, trigger: str | None = None,
+                 apply=None, restore=None) -> None:
+        self.config = config if config is not None else load_config()
+        self.path = path
+        self.trigger = trigger
+        self.apply = apply or apply_thermal_lighting
+        self.restore = restore or restore_state
+        self.profile: str | None = None
+        self.latencies: list[float] = []
+        self._fd = os.open(path, os.O_RDONLY)
+        self._trigger_fd = None
+
+    def read_profile(self) -> str:
+        # Reading the attribute also re-arms the notification
+        return os.pread(self._fd, 64, 0).decode().strip()
+
+    def check(self, woken: float | None = None) -> bool:
+        """Rereads the profile and switches the lighting if it changed, returns True when it switched."""
+        profile = self.read_profile()
+        if profile == self.profile:
+            return False
+        previous, self.profile = self.profile, profile
+        mapping = self.config.get(profile)
+        try:
+            if mapping is not None:
+                self.apply(mapping)
+            elif previous is not None and self.config.get(previous) is not None:
+                self.restore()
+        except OSError as exc:
+            print(f"Could not update the lighting: {exc}")
+            return False
+        if woken is not None:
+            self.latencies.append((time.perf_counter() - woken) * 1000)
+            print(f"{profile}: lighting updated in {self.latencies[-1]:.2f} ms", flush=True)
+        return True
+
+    def run(self) -> None:
+        self.check()
+        poller = select.poll()
+        poller.register(self._fd, select.POLLPRI | select.POLLERR)
+        if self.trigger:
+            if not os.path.exists(self.trigger):
+                os.mkfifo(self.trigger, 0o600)
+            self._trigger_fd = os.open(self.trigger, os.O_RDONLY | os.O_NONBLOCK)
+            # Our own writer keeps the FIFO from reporting end of file between triggers
+            os.open(self.trigger, os.O_WRONLY)
+            poller.register(self._trigger_fd, select.POLLIN)
+        while True:
+            events = poller.poll()
+            woken = time.perf_counter()
+            for fd, _event in events:
+                if fd == self._trigger_fd:
+                    os.read(self._trigger_fd, 4096)
+            self.check(woken)
+
+    def stats(self) -> str:
+        if not self.latencies:
+            return "no changes"
+        ordered = sorted(self.latencies)
+        return (f"changes: {len(ordered)}, response median: {ordered[len(ordered) // 2]:.2f} ms, "
+                f"max: {ordered[-1]:.2f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__ + f"""
+Defaults when '{THERMAL_CONFIG_FILE}' does not exist:
+{json.dumps(DEFAULT_CONFIG, indent=4)}
+""", formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--profile-path', default=PLATFORM_PROFILE, help="platform_profile attribute to watch")
+    parser.add_argument('--trigger', help="FIFO that forces a reread when written to, for testing")
+    args = parser.parse_args()
+
+    try:
+        watcher = ThermalWatcher(path=args.profile_path, trigger=args.trigger)
+    except FileNotFoundError:
+        print(f"'{args.profile_path}' does not exist, is the module loaded with platform profile support?")
+        exit(1)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        print(watcher.stats())
+
+
+if __name__ == "__main__":
+    main()
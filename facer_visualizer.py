@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+import argparse
+import struct
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from facer_calibrate import max_write_rate
+from facer_color import luts
+from facer_devwatch import DeviceWriter, wait_for_devices
+from facer_power import frame_rate_cap
+from facer_rgb import CHARACTER_DEVICE, CHARACTER_DEVICE_STATIC, PAYLOAD_SIZE_STATIC_MODE, static_mode_payload, write_payload
+
+ZONE_COUNT = 4
+# Lower edge of every band in Hz, left zone = bass, right zone = treble
+BAND_EDGES = (20, 250, 2000, 6000)
+ZONE_COLORS = (
+    (255, 0, 0),
+    (255, 127, 0),
+    (0, 255, 0),
+    (0, 0, 255),
+)
+
+
+class SpectrumAnalyzer:
+    """Splits fixed-size blocks of 16-bit PCM into four band levels.
+
+    Every buffer is allocated once in the constructor; process() only
+    writes into them, so the steady state does no per-block allocation.
+    """
+
+    def __init__(self, block_size: int, rate: int, channels: int, decay: float = 0.995) -> None:
+        self.block_size = block_size
+        self.rate = rate
+        self.channels = channels
+        self.decay = decay
+
+        self.raw = bytearray(block_size * channels * 2)
+        self._samples = np.frombuffer(self.raw, dtype="<i2").reshape(block_size, channels)
+        self._mono = np.empty(block_size, dtype=np.float64)
+        self._window = np.hanning(block_size)
+        self._spectrum = np.empty(block_size // 2 + 1, dtype=np.complex128)
+        self._magnitude = np.empty(block_size // 2 + 1, dtype=np.float64)
+        self._bands = np.empty(ZONE_COUNT, dtype=np.float64)
+        self._peaks = np.full(ZONE_COUNT, 1e-9, dtype=np.float64)
+        self.levels = np.zeros(ZONE_COUNT, dtype=np.float64)
+
+        bin_width = rate / block_size
+        self._edges = np.array([min(int(edge / bin_width), block_size // 2) for edge in BAND_EDGES], dtype=np.intp)
+        self._edges = np.maximum.accumulate(np.maximum(self._edges, np.arange(ZONE_COUNT)))
+
+        # numpy >= 2.0 can write the FFT into a preallocated array
+        try:
+            np.fft.rfft(self._mono, out=self._spectrum)
+            self._fft_in_place = True
+        except TypeError:
+            self._fft_in_place = False
+
+    def process(self) -> np.ndarray:
+        """Analyses the block currently held in `raw` and returns levels in [0, 1]."""
+        np.mean(self._samples, axis=1, out=self._mono)
+        np.multiply(self._mono, self._window, out=self._mono)
+        if self._fft_in_place:
+            np.fft.rfft(self._mono, out=self._spectrum)
+        else:
+            self._spectrum[:] = np.fft.rfft(self._mono)
+        np.absolute(self._spectrum, out=self._magnitude)
+        np.add.reduceat(self._magnitude, self._edges, out=self._bands)
+
+        # Automatic gain: every band is scaled against its own slowly decaying peak
+        np.multiply(self._peaks, self.decay, out=self._peaks)
+        np.maximum(self._peaks, self._bands, out=self._peaks)
+        np.divide(self._bands, self._peaks, out=self.levels)
+        return self.levels
+
+
+class ZoneWriter:
+    """Writes through one open static device descriptor and rewrites only zones whose colour changed.
+
+    The device is reopened after a module reload; frames that cannot be
+    written meanwhile are counted in `errors` and skipped.
+    """
+
+    def __init__(self, device: str | None) -> None:
+        self._device = DeviceWriter(device) if device else None
+        self._payloads = [bytearray(PAYLOAD_SIZE_STATIC_MODE) for _ in range(ZONE_COUNT)]
+        self._luts = luts()
+        for zone, payload in enumerate(self._payloads):
+            payload[0] = 1 << zone
+        self.writes = 0
+        self.errors = 0
+
+    def update(self, levels: np.ndarray) -> None:
+        written = False
+        for zone, payload in enumerate(self._payloads):
+            level = levels[zone]
+            red, green, blue = ZONE_COLORS[zone]
+            changed = False
+            for idx, channel in enumerate((red, green, blue), start=1):
+                value = self._luts[idx - 1][int(channel * level)]
+                if payload[idx] != value:
+                    payload[idx] = value
+                    changed = True
+            if changed:
+                self.writes += 1
+                written = True
+                if self._device:
+                    try:
+                        self._device.write(payload)
+                    except OSError:
+                        self.errors += 1
+        if self._device and not written:
+            # Silence: let go of the device so the module can be reloaded
+            self._device.idle()
+
+    def close(self) -> None:
+        if self._device:
+            self._device.close()
+
+
+def read_wav_header(stream) -> tuple[int, int]:
+    """Parses a RIFF/WAVE header and leaves `stream` at the first sample.
+
+    Returns (rate, channels); only 16-bit PCM is supported.
+    """
+    riff, _size, wave = struct.unpack("<4sI4s", stream.read(12))
+    if riff != b"RIFF" or wave != b"WAVE":
+        raise ValueError("Not a WAV file")
+    rate = channels = None
+    while True:
+        header = stream.read(8)
+        if len(header) < 8:
+            raise ValueError("WAV file has no data chunk")
+        chunk_id, chunk_size = struct.unpack("<4sI", header)
+        if chunk_id == b"data":
+            break
+        chunk = stream.read(chunk_size + (chunk_size & 1))
+        if chunk_id == b"fmt ":
+            audio_format, channels, rate, _byte_rate, _align, bits = struct.unpack("<HHIIHH", chunk[:16])
+            if audio_format != 1 or bits != 16:
+                raise ValueError("Only 16-bit PCM WAV files are supported")
+    if rate is None:
+        raise ValueError("WAV file has no fmt chunk")
+    return rate, channels
+
+
+def read_block(stream, buffer: bytearray, view: memoryview) -> bool:
+    filled = 0
+    while filled < len(buffer):
+        count = stream.readinto(view[filled:])
+        if not count:
+            return False
+        filled += count
+    return True
+
+
+def report(timings: np.ndarray, count: int, budget: float, writes: int) -> None:
+    if not count:
+        return
+    used = np.sort(timings[:count]) * 1000
+    print(
+        f"blocks: {count} | block budget: {budget * 1000:.2f} ms | "
+        f"processing mean: {used.mean():.3f} ms, p99: {used[int(count * 0.99)]:.3f} ms, max: {used[-1]:.3f} ms | "
+        f"zone writes: {writes}",
+        file=sys.stderr,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="""Drives the four static zones from an audio spectrum.
+
+Reads signed 16-bit little-endian PCM from stdin, a FIFO or a WAV file, splits every
+block into four frequency bands (bass on the left, treble on the right) and writes
+each band level as a static zone color.
+
+Some sample commands:
+
+Visualise whatever PulseAudio/PipeWire is playing:
+parec --format=s16le --rate=48000 --channels=2 -d @DEFAULT_MONITOR@ | ./facer_visualizer.py
+
+Play a WAV file onto the keyboard:
+./facer_visualizer.py -i song.wav
+""", formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('-i', dest='input', default='-', help="PCM/WAV file or FIFO, '-' for stdin (default)")
+    parser.add_argument('-r', dest='rate', type=int, default=48000, help="Sample rate of raw PCM input")
+    parser.add_argument('-c', dest='channels', type=int, default=2, help="Channel count of raw PCM input")
+    parser.add_argument('-n', dest='block_size', type=int, default=2048, help="FFT block size in frames")
+    parser.add_argument('-b', dest='brightness', type=int, default=100)
+    parser.add_argument('--dry-run', action='store_true', help="Analyse only, do not write to the device")
+    parser.add_argument('--stats-every', type=float, default=0, help="Print block timing every N seconds")
+    parser.add_argument('--wait', type=float, default=0, help="Seconds to wait for the keyboard devices at start")
+    args = parser.parse_args()
+
+    if args.input == '-':
+        stream = sys.stdin.buffer
+    else:
+        stream = open(args.input, 'rb')
+
+    rate, channels = args.rate, args.channels
+    is_wav = stream.peek(4)[:4] == b"RIFF" if hasattr(stream, "peek") else False
+    if is_wav:
+        rate, channels = read_wav_header(stream)
+    # Regular files are read faster than real time, pace them to the sample clock
+    paced = args.input != '-' and Path(args.input).is_file()
+
+    analyzer = SpectrumAnalyzer(args.block_size, rate, channels)
+    writer = ZoneWriter(None if args.dry_run else CHARACTER_DEVICE_STATIC)
+    if not args.dry_run:
+        if args.wait and not wait_for_devices([CHARACTER_DEVICE, CHARACTER_DEVICE_STATIC], args.wait):
+            sys.exit(f"Keyboard devices did not appear within {args.wait:g} seconds")
+        write_payload(CHARACTER_DEVICE, static_mode_payload(args.brightness))
+
+    budget = args.block_size / rate
+    timings = np.zeros(max(1, int(args.stats_every / budget)) if args.stats_every else 1 << 16, dtype=np.float64)
+    count = 0
+    view = memoryview(analyzer.raw)
+    next_block = time.monotonic()
+    blocks_per_second = max(1, round(1 / budget))
+    block = 0
+    skip = 1
+    try:
+        while read_block(stream, analyzer.raw, view):
+            if block % blocks_per_second == 0:
+                # On battery facer_power.py caps the frame rate of software animations, and a block
+                # can take one write per zone, which the calibrated device rate has to allow
+                cap = min(frame_rate_cap(blocks_per_second),
+                          max_write_rate("static", blocks_per_second * ZONE_COUNT) / ZONE_COUNT)
+                skip = max(1, round(blocks_per_second / cap))
+            block += 1
+            if block % skip == 0:
+                started = time.perf_counter()
+                writer.update(analyzer.process())
+                timings[count % len(timings)] = time.perf_counter() - started
+                count += 1
+                if args.stats_every and count % len(timings) == 0:
+                    report(timings, len(timings), budget, writer.writes)
+            if paced:
+                next_block += budget
+                delay = next_block - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        report(timings, min(count, len(timings)), budget, writer.writes)
+        writer.close()
+        stream.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,11 +4,14 @@
 # After installation you can manage it as a usual service manually. Example: 'systemctl start/stop turbo-fan',  'systemctl enable/disable turbo-fan'
 # To uninstall service, run this script with 'remove' argument. Example: 'sudo bash ./install_service.sh remove'.
 # Note!!! Before removing, don't forget to switch off the turbo button because you will have forever turbo fan :)
+# The last lighting applied by the user running sudo is restored by the acer-rgb-restore service as soon as udev creates the keyboard devices.
 mode=${1:-install} # Allowed modes: "install" and "remove". Default: install.
 service=turbo-fan # Service name
 target_dir=/opt/turbo-fan # Instalation folder
 service_dir=/etc/systemd/system # Service setup folder (where all services are stored)
-service_start_delay=5 # Delay in seconds before the service starts.
+restore_service=acer-rgb-restore # Service restoring the last keyboard lighting
+udev_rule=/etc/udev/rules.d/99-acer-rgb-restore.rules # Starts the restore service when the devices appear
+user_home=$(getent passwd "${SUDO_USER:-root}" | cut -d: -f6) # Home holding the last lighting state
 
 echo "[Mode: $mode]";
 
@@ -29,6 +32,12 @@ if [[ "$mode" == "install" || "$mode" == "remove" ]]; then
 		rm $service_dir/turbo-fan.service
 		systemctl daemon-reload
 	fi
+	if [[ -f "$service_dir/$restore_service.service" ]]; then
+		echo "['$restore_service' service is presented. Remove it.]";
+		rm -f $service_dir/$restore_service.service $udev_rule
+		systemctl daemon-reload
+		udevadm control --reload
+	fi
 		
 	# Remove old files
 	echo "[Remove old data]";
@@ -48,7 +57,6 @@ then
 [Unit]
 Description = Enables turbo button
 After=sysinit.target
-StartLimitIntervalSec=$service_start_delay
 
 [Service]
 Type=simple
@@ -64,18 +72,37 @@ WantedBy=multi-user.target
 EOF
 	chown -R root:root $target_dir
 
-KERNELVERSION=$(uname -r)
+	echo "[Create $restore_service service]"
+	cat << EOF > $service_dir/$restore_service.service
+[Unit]
+Description = Restores the last keyboard lighting
+ConditionPathExists=$user_home/.config/predator/last_state.json
+
+[Service]
+Type=oneshot
+Environment=HOME=$user_home
+ExecStart=/usr/bin/python3 $target_dir/facer_rgb.py --restore
+ExecStartPost=/bin/sh -c 'echo "Keyboard lighting restored \$\$(cut -d " " -f 1 /proc/uptime)s after boot"'
+EOF
+
+	# The static device is created last, once it exists both devices accept writes
+	cat << EOF > $udev_rule
+ACTION=="add", SUBSYSTEM=="acer-gkbbl-static", KERNEL=="acer-gkbbl-static-0", TAG+="systemd", ENV{SYSTEMD_WANTS}+="$restore_service.service"
+EOF
+	udevadm control --reload
 
     cat << EOF > $target_dir/service.sh
-KERNELVERSION="$KERNELVERSION"
 cd $target_dir
 
+# The module is rebuilt only when the kernel or the module sources changed since the last build
+BUILD_HASH=\$( { uname -r; cat src/facer.c Makefile; } | sha256sum | cut -d " " -f 1)
+
 rm /dev/acer-gkbbl-0 /dev/acer-gkbbl-static-0 -f
 
-if [ "\$(uname -r)" != "\$KERNELVERSION" ] || [ ! -f $target_dir/src/facer.ko ]; then
+if [ ! -f $target_dir/src/facer.ko ] || [ "\$(cat $target_dir/.build_hash 2>/dev/null)" != "\$BUILD_HASH" ]; then
 	make clean
-    source ./install.sh
-	sed -i "s/^KERNELVERSION.*/KERNELVERSION=\"\$(uname -r)\"/" $target_dir/service.sh
+	source ./install.sh
+	echo "\$BUILD_HASH" > $target_dir/.build_hash
 else
 	rmmod acer_wmi
 	rmmod facer
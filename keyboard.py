@@ -1,265 +1,208 @@
-import os
-from time import sleep as sleep
-
-(
-    mode_choice,
-    zone_list,
-    speed_choice,
-    bright_choice,
-    direction_choice,
-    color_choice,
-    final_command,
-) = ([], [], [], [], [], [], [])
-choice = 0
-
-
-def setup():
-    if not (".keyboard_cache" in [f for f in os.listdir(".") if f.startswith(".")]):
-        os.system("touch .keyboard_cache")
-
-
-def prep():
-    global mode_choice, zone_list, speed_choice, bright_choice, direction_choice, color_choice, final_command
-    command = "./facer_rgb.py "
-    if mode_choice:
-        command += f"-m {mode_choice[0]} "
-    if speed_choice:
-        command += f"-s {speed_choice[0]} "
-    if bright_choice:
-        command += f"-b {bright_choice[0]} "
-    if direction_choice:
-        command += f"-d {direction_choice[0]} "
-    if color_choice:
-        command += f"-cR {color_choice[0]} -cB {color_choice[1]} -cG {color_choice[2]} "
-    if zone_list:
-        zone = list(map(lambda x: f"-z {x} ", zone_list))
-        for i in zone:
-            final_command.append(command + i)
-        pass
-    else:
-        final_command.append(command)
-
-
-def speed():
-    global speed_choice, choice
-    try:
-        choice = int(
-            input(
-                "Enter the Value of Speed [0-9] \n0 -> Static\n1 -> Slowest\n9 -> Fastest\nJust Press Enter to use the Default Value:"
-            )
-        )
-    except ValueError:
-        os.system("clear")
-        return None
-    if choice < 0 or choice > 9:
-        print("Invalid Choice. Try again")
-        sleep(1.5)
-        os.system("clear")
-        speed()
-    else:
-        speed_choice.append(choice)
-        os.system("clear")
-
-
-def bright():
-    global choice, bright_choice
-    try:
-        choice = int(
-            input(
-                "Enter the Value of Brightness [0-100]\n0 -> Switched Off\n100 -> Brightest\nJust Press Enter to use the Default Value:"
-            )
-        )
-    except ValueError:
-        os.system("clear")
-        return None
-    if choice < 0 or choice > 100:
-        print("Invalid Choice. Try again")
-        sleep(1.5)
-        os.system("clear")
-        bright()
-    else:
-        bright_choice.append(choice)
-        os.system("clear")
-
-
-def direction():
-    global direction_choice, choice
-    try:
-        choice = int(
-            input(
-                "Enter the Direction of Animation [1/2]"
-                "\n1 -> Right to Left"
-                "\n2 -> Left to Right"
-                "\nJust Press Enter to use the Default Value:"
-            )
-        )
-    except ValueError:
-        os.system("clear")
-        return None
-    if choice not in [1, 2]:
-        print("Invalid Choice. Try again")
-        sleep(1.5)
-        os.system("clear")
-        direction()
-    else:
-        direction_choice.append(choice)
-        os.system("clear")
-
-
-def zone():
-    global zone_list
-    zones = input(
-        "Enter the Zone ID(s) you want to select (1-4) seperated by space"
-        "\nIf you want to select all the zones just press Enter:"
-    )
-    if len(zones) == 0:
-        os.system("clear")
-        zone_list = [1, 2, 3, 4]
-        return None
-    z_list = list(map(lambda x: int(x), zones.split()))
-    if len(z_list) < 5 and set(z_list).issubset({1, 2, 3, 4}):
-        zone_list = list(map(lambda x: int(x), zones.split()))
-        os.system("clear")
-    else:
-        print("Invalid Selection, Choose Again")
-        sleep(1.5)
-        os.system("clear")
-        zone()
-
-
-def color():
-    global color_choice
-    raw = input(
-        "Enter a Valid RGB code with all the channels seperated by space"
-        "\nExample: 255 255 255"
-        "\nJust Press Enter to use the Default Color (White):"
-    )
-    if len(raw) == 0:
-        color_choice = [255, 255, 255]
-        os.system("clear")
-        return None
-    inter = raw.split(" ")
-    values = []
-    try:
-        for i in inter:
-            if i == "":
-                continue
-            elif i != "" and (int(i) < 0 or int(i) > 255):
-                print("RGB values should be between 0 - 255")
-                sleep(1.5)
-                os.system("clear")
-                color()
-            else:
-                values.append(int(i))
-    except ValueError:
-        print("Invalid Values. Try Again!")
-        sleep(1.5)
-        os.system("clear")
-        color()
-    if len(values) != 3:
-        print("There are 3 channels")
-        sleep(1.5)
-        os.system("clear")
-        color()
-    color_choice = values
-    os.system("clear")
-
-
-def rerun():
+import curses
+import time
+
+from facer_calibrate import max_write_rate
+from facer_rgb import apply_settings, parser, restore_state
+
+MODES = ["Static", "Breathing", "Neon", "Wave", "Shifting", "Zoom"]
+
+# Settings shown for every mode, in the order they are listed on screen
+MODE_FIELDS = {
+    0: ["zones", "brightness", "red", "green", "blue"],
+    1: ["speed", "brightness", "red", "green", "blue"],
+    2: ["speed", "brightness"],
+    3: ["speed", "brightness", "direction"],
+    4: ["speed", "brightness", "red", "green", "blue", "direction"],
+    5: ["speed", "brightness", "red", "green", "blue"],
+}
+
+# name -> (label, minimum, maximum)
+FIELDS = {
+    "mode": ("Mode", 0, len(MODES) - 1),
+    "speed": ("Speed", 0, 9),
+    "brightness": ("Brightness", 0, 100),
+    "direction": ("Direction", 1, 2),
+    "red": ("Red", 0, 255),
+    "green": ("Green", 0, 255),
+    "blue": ("Blue", 0, 255),
+    "zones": ("Zones", 1, 4),
+}
+
+# Live preview writes per second when the device has not been calibrated (facer_calibrate.py)
+LIVE_PREVIEW_RATE = 20
+
+HELP = "Up/Down select  Left/Right adjust  PgUp/PgDn +/-10  1-4 toggle zone  Enter apply  l live preview  r re-run last  q quit"
+
+
+def default_settings():
+    settings = parser.parse_args([])
+    settings.red, settings.green, settings.blue = 255, 255, 255
+    settings.zones = [1, 2, 3, 4]
+    return settings
+
+
+def rerun() -> str:
     # This is different from the refresh.sh and should not be considered redundant
-    # If we are using the Zones Function, then the current script will run multiple commands to match
-    # all the zones the user has specifies but in this case the refresh will only run the last command.
-    global final_command
-    with open(".keyboard_cache", "r") as file:
-        data = file.read()
-    final_command.append(data.split(","))
-    exit()
-
-
-def run():
-    global final_command
-    for i in final_command:
-        os.system(i)
-    with open(".keyboard_cache", "w") as file:
-        file.write(",".join(final_command))
-
-
-def mode():
-    global mode_choice, choice
-    print("Choose the RGB Mode")
-    print("1. Static")
-    print("2. Breathing")
-    print("3. Neon")
-    print("4. Wave")
-    print("5. Shifting")
-    print("6. Zoom")
-    print("7. Re-Run the Last Command")
-    print("0. Exit")
-    try:
-        choice = int(input("Enter your choice: "))
-        if choice == 1:
-            os.system("clear")
-            mode_choice.append(0)
-            zone()
-            color()
-        elif choice == 2:
-            os.system("clear")
-            mode_choice.append(1)
-            speed()
-            bright()
-            color()
-        elif choice == 3:
-            os.system("clear")
-            mode_choice.append(2)
-            speed()
-            bright()
-        elif choice == 4:
-            os.system("clear")
-            mode_choice.append(3)
-            speed()
-            bright()
-            direction()
-        elif choice == 5:
-            os.system("clear")
-            mode_choice.append(4)
-            speed()
-            bright()
-            color()
-            direction()
-        elif choice == 6:
-            os.system("clear")
-            mode_choice.append(5)
-            speed()
-            bright()
-            color()
-        elif choice == 7:
-            os.system("clear")
-            rerun()
-        elif choice == 0:
-            os.system("clear")
-            exit()
-        else:
-            print("Invalid Choice")
-            sleep(2)
-            os.system("clear")
-            mode()
-    except ValueError:
-        print("Invalid Values. Try Again")
-        sleep(1.5)
-        os.system("clear")
-        mode()
-
-
-def start():
+    # The last state holds every zone color that was applied, while refresh only reloads the module.
+    if not restore_state():
+        return "Nothing to re-run yet"
+    return "Re-applied the last settings"
+
+
+def live_preview_interval() -> float:
+    # A static preview writes every zone plus the dynamic device
+    rate = min(max_write_rate("dynamic", LIVE_PREVIEW_RATE), max_write_rate("static", LIVE_PREVIEW_RATE * 4) / 4)
+    return 1.0 / rate
+
+
+class KeyboardTUI:
+    def __init__(self, screen) -> None:
+        self.screen = screen
+        self.settings = default_settings()
+        self.selected = 0
+        self.live = False
+        self.status = ""
+        self.swatch = None
+        # Live changes are coalesced and written at most once per interval, without recording them
+        self.pending = False
+        self.previewed = False
+        self.interval = live_preview_interval()
+        self._next_write = 0.0
+
+        curses.curs_set(0)
+        self.screen.keypad(True)
+        if curses.has_colors():
+            curses.start_color()
+            curses.use_default_colors()
+            if curses.COLORS >= 256:
+                self.swatch = 1
+
+    def fields(self) -> list[str]:
+        return ["mode"] + MODE_FIELDS[self.settings.mode]
+
+    def adjust(self, field: str, step: int) -> None:
+        _label, minimum, maximum = FIELDS[field]
+        if field == "zones":
+            return
+        value = getattr(self.settings, field) + step
+        setattr(self.settings, field, max(minimum, min(maximum, value)))
+        self.selected = min(self.selected, len(self.fields()) - 1)
+
+    def toggle_zone(self, zone: int) -> None:
+        zones = set(self.settings.zones) ^ {zone}
+        self.settings.zones = sorted(zones) or [zone]
+
+    def value_text(self, field: str) -> str:
+        if field == "mode":
+            return f"{self.settings.mode + 1}. {MODES[self.settings.mode]}"
+        if field == "zones":
+            return " ".join(str(zone) if zone in self.settings.zones else "-" for zone in range(1, 5))
+        if field == "direction":
+            return "Right to Left" if self.settings.direction == 1 else "Left to Right"
+        return str(getattr(self.settings, field))
+
+    def draw(self) -> None:
+        self.screen.erase()
+        height, width = self.screen.getmaxyx()
+        try:
+            self.screen.addnstr(0, 0, "Acer Predator keyboard RGB", max(1, width - 1), curses.A_BOLD)
+            for row, field in enumerate(self.fields()):
+                attr = curses.A_REVERSE if row == self.selected else curses.A_NORMAL
+                self.screen.addnstr(2 + row, 2, f"{FIELDS[field][0]:<12}", max(1, width - 3))
+                self.screen.addnstr(2 + row, 15, f"< {self.value_text(field)} >", max(1, width - 16), attr)
+
+            row = 3 + len(self.fields())
+            if self.swatch and "red" in self.fields():
+                # Closest colour of the xterm 256 colour cube
+                r, g, b = (round(value / 51) for value in (self.settings.red, self.settings.green, self.settings.blue))
+                curses.init_pair(self.swatch, -1, 16 + 36 * r + 6 * g + b)
+                self.screen.addnstr(row, 2, " " * 24, max(1, width - 3), curses.color_pair(self.swatch))
+                row += 1
+
+            live = "on" if self.live else "off"
+            self.screen.addnstr(row + 1, 2, f"Live preview: {live}", max(1, width - 3))
+            self.screen.addnstr(row + 2, 2, self.status, max(1, width - 3), curses.A_BOLD)
+            self.screen.addnstr(height - 1, 0, HELP, max(1, width - 1), curses.A_DIM)
+        except curses.error:
+            # The terminal is too small for everything, show what fits
+            pass
+        self.screen.refresh()
+
+    def write(self, message: str) -> None:
+        self.pending = False
+        try:
+            apply_settings(self.settings)
+            self.previewed = False
+            self.status = message
+        except OSError as exc:
+            self.status = f"Could not write to the device: {exc}"
+
+    def preview(self) -> None:
+        self.pending = False
+        self._next_write = time.monotonic() + self.interval
+        try:
+            apply_settings(self.settings, record=False)
+            self.previewed = True
+            self.status = "Live preview"
+        except OSError as exc:
+            self.status = f"Could not write to the device: {exc}"
+
+    def quit(self) -> None:
+        if self.previewed:
+            # Unconfirmed previews are not kept
+            try:
+                restore_state()
+            except OSError:
+                pass
+
+    def run(self) -> None:
+        while True:
+            if self.pending and time.monotonic() >= self._next_write:
+                self.preview()
+            self.draw()
+            # Wake up for the next coalesced write even if no key is pressed
+            wait = self._next_write - time.monotonic()
+            self.screen.timeout(max(1, int(wait * 1000) + 1) if self.pending else -1)
+            key = self.screen.getch()
+            if key == -1:
+                continue
+            field = self.fields()[self.selected]
+            changed = False
+            if key in (ord("q"), 27):
+                self.quit()
+                return
+            elif key == curses.KEY_UP:
+                self.selected = (self.selected - 1) % len(self.fields())
+            elif key == curses.KEY_DOWN:
+                self.selected = (self.selected + 1) % len(self.fields())
+            elif key in (curses.KEY_LEFT, curses.KEY_RIGHT, curses.KEY_NPAGE, curses.KEY_PPAGE):
+                step = {curses.KEY_LEFT: -1, curses.KEY_RIGHT: 1, curses.KEY_NPAGE: -10, curses.KEY_PPAGE: 10}[key]
+                self.adjust(field, step)
+                changed = True
+            elif ord("1") <= key <= ord("4") and "zones" in self.fields():
+                self.toggle_zone(key - ord("0"))
+                changed = True
+            elif key == ord("l"):
+                self.live = not self.live
+                changed = self.live
+                self.pending = self.pending and self.live
+            elif key in (curses.KEY_ENTER, 10, 13):
+                self.write("Settings applied")
+            elif key == ord("r"):
+                try:
+                    self.status = rerun()
+                except OSError as exc:
+                    self.status = f"Could not write to the device: {exc}"
+            if changed:
+                self.status = ""
+                self.pending = self.live
+
+
+def start() -> None:
     try:
-        os.system("clear")
-        setup()
-        mode()
-        prep()
-        run()
+        curses.wrapper(lambda screen: KeyboardTUI(screen).run())
     except KeyboardInterrupt:
         print("\nExiting the Program")
-        exit()
 
 
 if __name__ == "__main__":
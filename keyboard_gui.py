@@ -2,6 +2,7 @@ import json
 import colorsys
 import subprocess
 import sys
+import time
 from pathlib import Path
 from tkinter import Canvas, IntVar, PhotoImage, StringVar, Tk, Toplevel, colorchooser, messagebox, ttk
 
@@ -11,6 +12,7 @@ LAST_PROFILE_NAME = CONFIG_DIRECTORY / "last_gui_profile.json"
 
 SCRIPT_PATH = Path(__file__).resolve().parent / "facer_rgb.py"
 DEFAULT_COLOR = (255, 255, 255)
+PREVIEW_FPS = 20
 
 
 class KeyboardGUI:
@@ -41,6 +43,7 @@ class KeyboardGUI:
         self.mode_label = StringVar(value=self._mode_option_label(self.mode.get()))
         self.speed = IntVar(value=4)
         self.brightness = IntVar(value=100)
+        self.transition = IntVar(value=0)
         self.direction = StringVar(value="1")
         self.zone_mode = StringVar(value="multi")
         self.red = IntVar(value=DEFAULT_COLOR[0])
@@ -54,14 +57,51 @@ class KeyboardGUI:
         self.status = StringVar(value="")
         self.effect_hint = StringVar(value="")
 
+        self._zone_rects: list[int] = []
+        self._preview_job: str | None = None
+        self._preview_visible = True
+        self._preview_frames = None
+        self._preview_frames_start = 0.0
+        self._color_styles: set[str] = set()
+        self._gradient_image: PhotoImage | None = None
+        self._startup_scheduled = False
+        self._thumbnail_cache = None
+        # facer_emulator pulls in numpy, so it is imported after the first frame; flat preview until then
+        self._emulator = None
+        self.startup_finished = False
+
         self._setup_theme()
         self._build_layout()
-        self._load_last_settings()
-        self._refresh_profile_options()
         self._update_effect_hint()
         self._update_zone_check_state()
         self._update_preview()
 
+        self.root.bind("<Map>", self._on_visibility_change)
+        self.root.bind("<Unmap>", self._on_visibility_change)
+
+    def _finish_startup(self) -> None:
+        # Runs once the window has been mapped and drawn, see _on_visibility_change
+        try:
+            import facer_emulator
+            self._emulator = facer_emulator
+        except ImportError:  # numpy is missing, keep the flat preview
+            pass
+        self._load_last_settings()
+        self._update_preview()
+        self._refresh_profile_options()
+        self._check_capabilities()
+        self.startup_finished = True
+
+    def _check_capabilities(self) -> None:
+        try:
+            from facer_caps import capabilities
+        except ImportError:
+            return
+        if not capabilities().dynamic_device:
+            # Nothing to write to, the controls still work for editing profiles
+            self.apply_button.state(["disabled"])
+            self.status.set("Nie znaleziono urządzenia klawiatury (czy moduł jest załadowany?).")
+
     def _setup_theme(self) -> None:
         style = ttk.Style(self.root)
         if "clam" in style.theme_names():
@@ -163,8 +203,14 @@ class KeyboardGUI:
         speed_scale.grid(row=4, column=1, sticky="ew", pady=4)
         ttk.Label(parent, textvariable=self.speed, width=4).grid(row=4, column=2, sticky="e", padx=(6, 0))
 
+        ttk.Label(parent, text="Transition (ms)").grid(row=5, column=0, sticky="w")
+        transition_scale = ttk.Scale(parent, variable=self.transition, from_=0, to=3000, orient="horizontal",
+                                     command=lambda value: self.transition.set(round(float(value), -2)))
+        transition_scale.grid(row=5, column=1, sticky="ew", pady=4)
+        ttk.Label(parent, textvariable=self.transition, width=4).grid(row=5, column=2, sticky="e", padx=(6, 0))
+
         ttk.Label(parent, textvariable=self.effect_hint, wraplength=280, foreground="#c9c9d1", background="#2a1f2e").grid(
-            row=5,
+            row=6,
             column=0,
             columnspan=3,
             sticky="w",
@@ -221,9 +267,8 @@ class KeyboardGUI:
             check.grid(row=0, column=idx, padx=4)
             self.zone_checkbuttons[zone] = check
 
-        ttk.Button(parent, text="APPLY", command=self._apply_settings, style="Accent.TButton").grid(
-            row=2, column=0, sticky="ew", pady=(14, 0)
-        )
+        self.apply_button = ttk.Button(parent, text="APPLY", command=self._apply_settings, style="Accent.TButton")
+        self.apply_button.grid(row=2, column=0, sticky="ew", pady=(14, 0))
 
     def _add_profile_controls(self, parent: ttk.Labelframe) -> None:
         ttk.Label(parent, text="Save as profile").grid(row=0, column=0, sticky="w")
@@ -235,6 +280,9 @@ class KeyboardGUI:
         self.profile_selector = ttk.Combobox(parent, textvariable=self.loaded_profile, state="readonly")
         self.profile_selector.grid(row=1, column=1, sticky="ew", padx=6, pady=(6, 0))
         ttk.Button(parent, text="Load", command=self._load_selected_profile).grid(row=1, column=2, sticky="e", pady=(6, 0))
+        ttk.Button(parent, text="Browse...", command=self._open_profile_browser).grid(
+            row=2, column=1, columnspan=2, sticky="e", pady=(6, 0)
+        )
 
     def _on_slider_move(self, _value: str) -> None:
         self._update_preview()
@@ -316,7 +364,9 @@ class KeyboardGUI:
 
         gradient_canvas = Canvas(gradient_frame, width=220, height=160, highlightthickness=1, highlightbackground="#555")
         gradient_canvas.grid(row=0, column=0)
-        gradient_image = self._build_gradient_image(220, 160)
+        if self._gradient_image is None:
+            self._gradient_image = self._build_gradient_image(220, 160)
+        gradient_image = self._gradient_image
         gradient_canvas.create_image(0, 0, anchor="nw", image=gradient_image)
 
         def pick_from_gradient(event: object) -> None:
@@ -453,13 +503,17 @@ class KeyboardGUI:
 
     def _build_gradient_image(self, width: int, height: int) -> PhotoImage:
         gradient = PhotoImage(width=width, height=height)
-        for x in range(width):
-            hue = x / width
-            for y in range(height):
-                saturation = 1
-                value = 1 - (y / height)
-                r, g, b = colorsys.hsv_to_rgb(hue, saturation, value)
-                gradient.put(self._rgb_to_hex((int(r * 255), int(g * 255), int(b * 255))), (x, y))
+        rows = []
+        for y in range(height):
+            saturation = 1
+            value = 1 - (y / height)
+            row = []
+            for x in range(width):
+                r, g, b = colorsys.hsv_to_rgb(x / width, saturation, value)
+                row.append(self._rgb_to_hex((int(r * 255), int(g * 255), int(b * 255))))
+            rows.append("{" + " ".join(row) + "}")
+        # One put for the whole image instead of one per pixel
+        gradient.put(" ".join(rows), to=(0, 0))
         return gradient
 
     def _color_from_gradient(self, x: int, y: int, width: int, height: int) -> str:
@@ -500,24 +554,22 @@ class KeyboardGUI:
             return
 
         self.preview_canvas.delete("all")
+        self._zone_rects = []
+        self._preview_frames = None
         total_width = 420
         zone_width = total_width // 4
         height = 120
         x_offset = 10
         y_offset = 30
 
+        zone_colors = self._preview_zone_colors(time.monotonic())
         for idx, zone in enumerate(self.zones, start=0):
             x1 = x_offset + idx * zone_width
             x2 = x1 + zone_width - 6
             y1 = y_offset
             y2 = y_offset + height
-            fill_color = self._current_color_hex() if self.zones[zone].get() else "#2f2f3a"
-            if self.mode.get() != "0":
-                if self.mode.get() in {"1", "4", "5"}:
-                    fill_color = self._current_color_hex()
-                else:
-                    fill_color = "#6b1a2d"
-            self.preview_canvas.create_rectangle(x1, y1, x2, y2, fill=fill_color, outline="#3a3a46", width=2)
+            rect = self.preview_canvas.create_rectangle(x1, y1, x2, y2, fill=zone_colors[idx], outline="#3a3a46", width=2)
+            self._zone_rects.append(rect)
             self.preview_canvas.create_text((x1 + x2) / 2, y1 + height / 2, text=str(zone), fill="#f6f7fb", font=("Segoe UI", 14, "bold"))
 
         brightness_text = f"Brightness: {self.brightness.get()}% | Speed: {self.speed.get()}"
@@ -537,8 +589,72 @@ class KeyboardGUI:
             fill="#c0c0c8",
             font=("Segoe UI", 10),
         )
+        self._schedule_preview()
+
+    def _preview_zone_colors(self, timestamp: float) -> list[str]:
+        if self._emulator is None:
+            return [self._flat_preview_color(zone) for zone in self.zones]
+
+        if self._preview_frames is not None:
+            index = int((timestamp - self._preview_frames_start) * PREVIEW_FPS)
+            if 0 <= index < len(self._preview_frames):
+                return self._preview_frames[index]
+
+        # Render a second worth of frames in one call and step through them
+        self._preview_frames_start = timestamp
+        timestamps = [timestamp + idx / PREVIEW_FPS for idx in range(PREVIEW_FPS)]
+        zone_colors = [self._current_color_hex() if var.get() else "#2f2f3a" for var in self.zones.values()]
+        frames = self._emulator.render(
+            int(self.mode.get()),
+            timestamps,
+            speed=self.speed.get(),
+            brightness=self.brightness.get(),
+            direction=int(self.direction.get()),
+            color=(self.red.get(), self.green.get(), self.blue.get()),
+            zone_colors=[self._hex_to_rgb(color) for color in zone_colors],
+        )
+        self._preview_frames = [[self._rgb_to_hex(tuple(int(c) for c in zone)) for zone in frame] for frame in frames]
+        return self._preview_frames[0]
+
+    def _flat_preview_color(self, zone: int) -> str:
+        if self.mode.get() == "0":
+            return self._current_color_hex() if self.zones[zone].get() else "#2f2f3a"
+        if self.mode.get() in {"1", "4", "5"}:
+            return self._current_color_hex()
+        return "#6b1a2d"
+
+    def _preview_is_animated(self) -> bool:
+        return self._emulator is not None and self.mode.get() != "0" and self.speed.get() > 0
+
+    def _schedule_preview(self) -> None:
+        if self._preview_job is None and self._preview_visible and self._preview_is_animated():
+            self._preview_job = self.root.after(1000 // PREVIEW_FPS, self._animate_preview)
+
+    def _animate_preview(self) -> None:
+        self._preview_job = None
+        if not self._preview_visible or not self._preview_is_animated():
+            return
+        for rect, color in zip(self._zone_rects, self._preview_zone_colors(time.monotonic())):
+            self.preview_canvas.itemconfigure(rect, fill=color)
+        self._schedule_preview()
+
+    def _on_visibility_change(self, event: object) -> None:
+        if event.widget is not self.root:
+            return
+        self._preview_visible = event.type == "19"  # Map
+        if self._preview_visible and not self._startup_scheduled:
+            # Profiles are read after the first paint, which Tk does in idle time right after mapping
+            self._startup_scheduled = True
+            self.root.after_idle(self._finish_startup)
+        if not self._preview_visible and self._preview_job is not None:
+            self.root.after_cancel(self._preview_job)
+            self._preview_job = None
+        self._schedule_preview()
 
     def _apply_settings(self) -> None:
+        if self.transition.get() > 0:
+            self._apply_with_transition()
+            return
         try:
             for command in self._build_commands():
                 subprocess.run(command, check=True)
@@ -548,6 +664,32 @@ class KeyboardGUI:
             self.status.set("Błąd podczas stosowania ustawień.")
             messagebox.showerror("Błąd", f"Nie udało się zastosować ustawień: {exc}")
 
+    def _apply_with_transition(self) -> None:
+        # facer_rgb.py fades to the saved profile; it runs in the background so the window stays responsive
+        self._save_last_profile()
+        command = [
+            sys.executable,
+            str(SCRIPT_PATH),
+            "-load",
+            LAST_PROFILE_NAME.stem,
+            "-transition",
+            f"{self.transition.get() / 1000:g}",
+        ]
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+        self.status.set("Trwa przejście...")
+        self.root.after(50, self._check_transition, process)
+
+    def _check_transition(self, process: subprocess.Popen) -> None:
+        if process.poll() is None:
+            self.root.after(50, self._check_transition, process)
+            return
+        output = process.stdout.read().strip()
+        if process.returncode:
+            self.status.set("Błąd podczas stosowania ustawień.")
+            messagebox.showerror("Błąd", f"Nie udało się zastosować ustawień (kod {process.returncode}).")
+        else:
+            self.status.set(f"Ustawienia zastosowane. {output}")
+
     def _build_commands(self) -> list[list[str]]:
         base_args = [
             sys.executable,
@@ -609,6 +751,19 @@ class KeyboardGUI:
         self._load_profile(CONFIG_DIRECTORY / f"{name}.json")
         self.status.set(f"Wczytano profil '{name}'.")
 
+    def _open_profile_browser(self) -> None:
+        from keyboard_gui_browser import ProfileBrowser, ThumbnailCache
+
+        # Thumbnails survive closing the browser, reopening it reads no unchanged profile again
+        if self._thumbnail_cache is None:
+            self._thumbnail_cache = ThumbnailCache(self.MODE_NAMES)
+        ProfileBrowser(self.root, CONFIG_DIRECTORY, self.MODE_NAMES, self._load_browsed_profile, self._thumbnail_cache)
+
+    def _load_browsed_profile(self, path: Path) -> None:
+        self._load_profile(path)
+        self.loaded_profile.set(path.stem)
+        self.status.set(f"Wczytano profil '{path.stem}'.")
+
     def _load_last_settings(self) -> None:
         if LAST_PROFILE_NAME.exists():
             self._load_profile(LAST_PROFILE_NAME)
@@ -647,6 +802,9 @@ class KeyboardGUI:
 
     def _make_color_style(self, hex_color: str) -> str:
         style_name = f"Color{hex_color.replace('#', '')}.TButton"
+        if style_name in self._color_styles:
+            return style_name
+        self._color_styles.add(style_name)
         style = ttk.Style(self.root)
         style.configure(style_name, background=hex_color, foreground="#0f0f0f")
         style.map(style_name, background=[("active", hex_color)])
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""Scrollable profile browser for keyboard_gui.py.
+
+Only the rows that are visible exist on the canvas: a small pool of row items
+is moved and recoloured while scrolling, so opening the browser costs the
+same with ten profiles or thousands. Every row shows the zone colours and the
+effect of the profile. They come from ThumbnailCache, which reads a profile
+only the first time it is shown and again once its modification time changes.
+Typing in the search box filters the in-memory name index, no file is read.
+
+Time opening the browser with 1000 generated profiles (uses a private Xvfb
+when DISPLAY is not set) and fail above 500 ms (--budget 0 only measures):
+./keyboard_gui_browser.py --benchmark 1000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from pathlib import Path
+from tkinter import Canvas, StringVar, Tk, Toplevel, ttk
+from typing import NamedTuple
+
+try:
+    import facer_emulator
+except ImportError:  # numpy is missing, thumbnails show the profile colour only
+    facer_emulator = None
+
+from facer_rgb import profile_settings
+
+ROW_HEIGHT = 30
+SWATCH_SIZE = 18
+THUMBNAIL_CACHE_SIZE = 2048
+EMPTY_ZONE = "#2f2f3a"
+
+
+class Thumbnail(NamedTuple):
+    colors: list[str]
+    label: str
+
+
+class ThumbnailCache:
+    """Zone colours and effect label per profile file, keyed by path and reused while the mtime is unchanged."""
+
+    def __init__(self, mode_names: dict[str, str], size: int = THUMBNAIL_CACHE_SIZE) -> None:
+        self.mode_names = mode_names
+        self.size = size
+        self.renders = 0
+        self._cache: OrderedDict[str, tuple[int, Thumbnail]] = OrderedDict()
+
+    def get(self, path: Path) -> Thumbnail:
+        key = str(path)
+        try:
+            mtime = os.stat(key).st_mtime_ns
+        except OSError:
+            return Thumbnail([EMPTY_ZONE] * 4, "missing")
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] == mtime:
+            self._cache.move_to_end(key)
+            return cached[1]
+        thumbnail = self.render(path)
+        self.renders += 1
+        self._cache[key] = (mtime, thumbnail)
+        if len(self._cache) > self.size:
+            self._cache.popitem(last=False)
+        return thumbnail
+
+    def render(self, path: Path) -> Thumbnail:
+        try:
+            with open(path, "r", encoding="utf-8") as profile_file:
+                settings = profile_settings(json.load(profile_file))
+            colors = self._zone_colors(settings)
+        except (OSError, ValueError, TypeError, AttributeError):
+            # Not a profile (e.g. not a JSON object) or an effect mode the emulator does not know
+            return Thumbnail([EMPTY_ZONE] * 4, "unreadable")
+        label = self.mode_names.get(str(settings.mode), str(settings.mode))
+        if settings.mode != 0:
+            label += f" · speed {settings.speed}"
+        return Thumbnail(colors, f"{label} · {settings.brightness}%")
+
+    @staticmethod
+    def _zone_colors(settings) -> list[str]:
+        color = (settings.red, settings.green, settings.blue)
+        if facer_emulator is not None:
+            zone_colors = [color if zone in settings.zones else (47, 47, 58) for zone in range(1, 5)]
+            # Half a cycle in, where Breath is at its peak; at phase 0 it is black
+            frame = facer_emulator.render(settings.mode, [facer_emulator.BASE_PERIOD / 2], 1, settings.brightness,
+                                          settings.direction, color, zone_colors)[0]
+            return ["#%02x%02x%02x" % tuple(int(c) for c in zone) for zone in frame]
+        if settings.mode == 0:
+            return ["#%02x%02x%02x" % color if zone in settings.zones else EMPTY_ZONE for zone in range(1, 5)]
+        return ["#%02x%02x%02x" % color] * 4
+
+
+class ProfileIndex:
+    """Profile names of a directory with lowercase search keys, read with a single scandir."""
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        self.names: list[str] = []
+        self._keys: list[str] = []
+
+    def refresh(self) -> None:
+        with os.scandir(self.directory) as entries:
+            self.names = sorted(entry.name[:-5] for entry in entries if entry.name.endswith(".json"))
+        self._keys = [name.lower() for name in self.names]
+
+    def search(self, text: str) -> list[int]:
+        """Returns the indexes of the names containing every word of `text`."""
+        words = text.lower().split()
+        if not words:
+            return list(range(len(self.names)))
+        return [idx for idx, key in enumerate(self._keys) if all(word in key for word in words)]
+
+    def path(self, idx: int) -> Path:
+        return self.directory / f"{self.names[idx]}.json"
+
+
+class ProfileBrowser:
+    def __init__(self, master, directory: Path, mode_names: dict[str, str], on_select,
+                 cache: ThumbnailCache | None = None) -> None:
+        self.on_select = on_select
+        self.cache = cache or ThumbnailCache(mode_names)
+        self.index = ProfileIndex(directory)
+        self.index.refresh()
+        self._matches = list(range(len(self.index.names)))
+        self._selected: int | None = None
+        # Per visible slot: background, four swatches, name, effect label
+        self._slots: list[list[int]] = []
+        self.drawn = False
+
+        self.window = Toplevel(master)
+        self.window.title("Profiles")
+        self.window.geometry("440x520")
+        self.window.configure(background="#1b1420")
+        self.window.columnconfigure(0, weight=1)
+        self.window.rowconfigure(1, weight=1)
+
+        self.search = StringVar(value="")
+        entry = ttk.Entry(self.window, textvariable=self.search)
+        entry.grid(row=0, column=0, columnspan=2, sticky="ew", padx=8, pady=8)
+        entry.focus_set()
+        self.search.trace_add("write", self._on_search)
+
+        self.canvas = Canvas(self.window, background="#120a14", highlightthickness=0, yscrollincrement=ROW_HEIGHT)
+        self.canvas.grid(row=1, column=0, sticky="nsew", padx=(8, 0))
+        scrollbar = ttk.Scrollbar(self.window, orient="vertical", command=self.canvas.yview)
+        scrollbar.grid(row=1, column=1, sticky="ns", padx=(0, 8))
+        self.canvas.configure(yscrollcommand=lambda first, last: (scrollbar.set(first, last), self._redraw()))
+
+        self.count = StringVar(value="")
+        ttk.Label(self.window, textvariable=self.count).grid(row=2, column=0, sticky="w", padx=8, pady=8)
+        ttk.Button(self.window, text="Load", command=self._choose).grid(row=2, column=1, sticky="e", padx=8, pady=8)
+
+        self.canvas.bind("<Configure>", lambda _event: self._redraw())
+        self.canvas.bind("<Button-1>", self._on_click)
+        self.canvas.bind("<Double-Button-1>", lambda event: (self._on_click(event), self._choose()))
+        self.canvas.bind("<MouseWheel>", lambda event: self.canvas.yview_scroll(-1 if event.delta > 0 else 1, "units"))
+        self.canvas.bind("<Button-4>", lambda _event: self.canvas.yview_scroll(-1, "units"))
+        self.canvas.bind("<Button-5>", lambda _event: self.canvas.yview_scroll(1, "units"))
+        self.window.bind("<Return>", lambda _event: self._choose())
+        self.window.bind("<Escape>", lambda _event: self.window.destroy())
+        self._update_scrollregion()
+
+    def _update_scrollregion(self) -> None:
+        self.canvas.configure(scrollregion=(0, 0, 400, len(self._matches) * ROW_HEIGHT))
+        self.count.set(f"{len(self._matches)} of {len(self.index.names)} profiles")
+
+    def _on_search(self, *_args: object) -> None:
+        self._matches = self.index.search(self.search.get())
+        self._selected = None
+        self.canvas.yview_moveto(0)
+        self._update_scrollregion()
+        self._redraw()
+
+    def _ensure_slots(self, count: int) -> None:
+        while len(self._slots) < count:
+            slot = [self.canvas.create_rectangle(0, 0, 0, 0, outline="", fill="#120a14")]
+            slot += [self.canvas.create_rectangle(0, 0, 0, 0, outline="#3a3a46") for _ in range(4)]
+            slot.append(self.canvas.create_text(0, 0, anchor="w", fill="#f6f7fb", font=("Segoe UI", 10, "bold")))
+            slot.append(self.canvas.create_text(0, 0, anchor="w", fill="#c0c0c8", font=("Segoe UI", 9)))
+            self._slots.append(slot)
+
+    def _redraw(self) -> None:
+        if not self.canvas.winfo_exists():
+            return
+        first = int(self.canvas.canvasy(0) // ROW_HEIGHT)
+        self._ensure_slots(max(1, self.canvas.winfo_height()) // ROW_HEIGHT + 2)
+        width = max(self.canvas.winfo_width(), 200)
+        for slot_idx, slot in enumerate(self._slots):
+            row = first + slot_idx
+            if row >= len(self._matches):
+                for item in slot:
+                    self.canvas.itemconfigure(item, state="hidden")
+                continue
+            idx = self._matches[row]
+            thumbnail = self.cache.get(self.index.path(idx))
+            top = row * ROW_HEIGHT
+            middle = top + ROW_HEIGHT / 2
+            background, swatches, name, label = slot[0], slot[1:5], slot[5], slot[6]
+            self.canvas.coords(background, 0, top, width, top + ROW_HEIGHT)
+            self.canvas.itemconfigure(background, state="normal", fill="#3b2540" if idx == self._selected else "#120a14")
+            for zone, (swatch, color) in enumerate(zip(swatches, thumbnail.colors)):
+                left = 8 + zone * (SWATCH_SIZE + 2)
+                self.canvas.coords(swatch, left, middle - SWATCH_SIZE / 2, left + SWATCH_SIZE, middle + SWATCH_SIZE / 2)
+                self.canvas.itemconfigure(swatch, state="normal", fill=color)
+            self.canvas.coords(name, 100, middle)
+            self.canvas.itemconfigure(name, state="normal", text=self.index.names[idx])
+            self.canvas.coords(label, 260, middle)
+            self.canvas.itemconfigure(label, state="normal", text=thumbnail.label)
+        if self.canvas.winfo_ismapped():
+            self.drawn = True
+
+    def _on_click(self, event) -> None:
+        row = int(self.canvas.canvasy(event.y) // ROW_HEIGHT)
+        if 0 <= row < len(self._matches):
+            self._selected = self._matches[row]
+            self._redraw()
+
+    def _choose(self) -> None:
+        if self._selected is None and len(self._matches) == 1:
+            self._selected = self._matches[0]
+        if self._selected is None:
+            return
+        path = self.index.path(self._selected)
+        self.window.destroy()
+        self.on_select(path)
+
+
+def benchmark(count: int) -> tuple[float, float, float, float]:
+    """Returns the cold open, warm open, average scroll step and search times in ms."""
+    from keyboard_gui import KeyboardGUI
+
+    with tempfile.TemporaryDirectory() as directory:
+        for idx in range(count):
+            with open(Path(directory) / f"profile {idx:04d}.json", "w", encoding="utf-8") as profile_file:
+                json.dump({"mode": str(idx % 6), "speed": idx % 10, "brightness": 100, "direction": "1",
+                           "zone_mode": "multi", "red": idx % 256, "green": (idx * 7) % 256, "blue": 50,
+                           "zones": {"1": 1, "2": idx % 2, "3": 1, "4": 0}}, profile_file)
+        root = Tk()
+        root.withdraw()
+        cache = ThumbnailCache(KeyboardGUI.MODE_NAMES)
+
+        def open_browser() -> tuple[ProfileBrowser, float]:
+            started = time.perf_counter()
+            browser = ProfileBrowser(root, Path(directory), KeyboardGUI.MODE_NAMES, lambda _path: None, cache)
+            while not browser.drawn:
+                root.update()
+            return browser, (time.perf_counter() - started) * 1000
+
+        browser, cold = open_browser()
+        steps = 50
+        started = time.perf_counter()
+        for _ in range(steps):
+            browser.canvas.yview_scroll(5, "units")
+            root.update()
+        scroll = (time.perf_counter() - started) * 1000 / steps
+        started = time.perf_counter()
+        browser.search.set("profile 09")
+        root.update()
+        search = (time.perf_counter() - started) * 1000
+        browser.window.destroy()
+        _browser, warm = open_browser()
+        root.destroy()
+    return cold, warm, scroll, search
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--benchmark', type=int, default=1000, metavar='PROFILES')
+    parser.add_argument('--budget', type=float, default=500,
+                        help="Maximum time to open the browser in ms, 0 to only measure")
+    args = parser.parse_args()
+
+    server = None
+    if not os.environ.get("DISPLAY"):
+        from keyboard_gui_startup import start_xvfb
+
+        server, os.environ["DISPLAY"] = start_xvfb()
+    try:
+        cold, warm, scroll, search = benchmark(args.benchmark)
+    finally:
+        if server is not None:
+            server.terminate()
+    print(f"profiles: {args.benchmark} | open: {cold:.1f} ms (cached thumbnails: {warm:.1f} ms) | "
+          f"scroll step: {scroll:.2f} ms | search: {search:.1f} ms")
+    if args.budget and cold > args.budget:
+        print(f"Opening the browser is over the budget of {args.budget:g} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
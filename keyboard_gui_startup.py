@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Measures how fast keyboard_gui.py shows its first frame.
+
+The GUI is started several times in fresh processes, each with a throw-away
+HOME holding a number of dummy profiles, and two times are taken from the
+moment keyboard_gui is imported:
+
+    first frame  the main window is exposed (drawn) for the first time
+    ready        the deferred startup work (last profile, profile list) is done
+
+When DISPLAY is not set a private Xvfb server is started for the runs. The
+script exits with status 1 when the median time to first frame is over the
+budget (800 ms unless --budget is given, 0 disables the check), so it can
+guard against startup regressions in CI:
+
+    ./keyboard_gui_startup.py --runs 5
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def child() -> None:
+    started = time.perf_counter()
+    import keyboard_gui
+
+    gui = keyboard_gui.KeyboardGUI()
+    first_frame = []
+    gui.root.bind("<Expose>", lambda event: first_frame or first_frame.append(time.perf_counter()), add="+")
+    while not first_frame or not gui.startup_finished:
+        gui.root.update()
+    ready = time.perf_counter()
+    gui.root.destroy()
+    print(json.dumps({"first_frame": first_frame[0] - started, "ready": ready - started}))
+
+
+def start_xvfb() -> tuple[subprocess.Popen, str]:
+    xvfb = shutil.which("Xvfb")
+    if xvfb is None:
+        sys.exit("DISPLAY is not set and Xvfb is not installed")
+    read_fd, write_fd = os.pipe()
+    server = subprocess.Popen([xvfb, "-displayfd", str(write_fd), "-screen", "0", "1280x800x24", "-nolisten", "tcp"],
+                              pass_fds=(write_fd,), stderr=subprocess.DEVNULL)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as display:
+        return server, ":" + display.readline().strip()
+
+
+def run_once(env: dict, profiles: int) -> dict:
+    with tempfile.TemporaryDirectory() as home:
+        profile_dir = os.path.join(home, ".config", "predator", "saved profiles")
+        os.makedirs(profile_dir)
+        for idx in range(profiles):
+            with open(os.path.join(profile_dir, f"profile{idx}.json"), "w") as f:
+                json.dump({"mode": str(idx % 6), "speed": 4, "brightness": 100, "direction": "1",
+                           "red": idx % 256, "green": 255, "blue": 50}, f)
+        result = subprocess.run([sys.executable, os.path.abspath(__file__), "--child"],
+                                env=dict(env, HOME=home), capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--profiles', type=int, default=200, help="Dummy profiles in the profile directory")
+    parser.add_argument('--budget', type=float, default=800,
+                        help="Maximum median time to first frame in ms, 0 to only measure")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child()
+        return
+
+    env = dict(os.environ)
+    server = None
+    if not env.get("DISPLAY"):
+        server, env["DISPLAY"] = start_xvfb()
+    try:
+        results = [run_once(env, args.profiles) for _ in range(args.runs)]
+    finally:
+        if server is not None:
+            server.terminate()
+
+    first_frame = statistics.median(result["first_frame"] for result in results) * 1000
+    ready = statistics.median(result["ready"] for result in results) * 1000
+    print(f"runs: {args.runs} | profiles: {args.profiles} | "
+          f"time to first frame: {first_frame:.1f} ms | ready: {ready:.1f} ms (medians)")
+    if args.budget and first_frame > args.budget:
+        print(f"Time to first frame is over the budget of {args.budget:g} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Matcher and incremental scan of facer_apps.py against a fake /proc tree.
+
+Run from the repository root: python -m unittest discover tests
+"""
+import os
+import re
+import sys
+import tempfile
+import unittest
+
+# facer_rgb creates its config directory under HOME when imported
+os.environ["HOME"] = tempfile.mkdtemp()
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from facer_apps import AppWatcher, Matcher, Rule  # noqa: E402
+
+
+def rules(*patterns: str) -> list[Rule]:
+    return [Rule(pattern, f"profile{idx}", None) for idx, pattern in enumerate(patterns)]
+
+
+class MatcherTest(unittest.TestCase):
+    def test_first_rule_wins(self):
+        matcher = Matcher(rules(r"\bcargo\b", r"steam_app_|\.exe\b"))
+        self.assertEqual(matcher.match("steam_app_42 cargo build"), 0)
+        self.assertEqual(matcher.match("wine game.exe"), 1)
+        self.assertIsNone(matcher.match("bash"))
+
+    def test_inline_flags(self):
+        matcher = Matcher(rules(r"\bmake\b", "(?i)steam"))
+        self.assertEqual(matcher.match("/usr/bin/Steam -silent"), 1)
+        self.assertIsNone(matcher.match("bash"))
+
+    def test_backreferences_keep_their_group(self):
+        matcher = Matcher(rules(r"(\w+)-dup", r"(\w+) \1"))
+        self.assertEqual(matcher.match("run run"), 1)
+        self.assertIsNone(matcher.match("run walk"))
+
+    def test_invalid_rule(self):
+        with self.assertRaises(re.error):
+            Matcher(rules("(unclosed"))
+
+    def test_no_rules(self):
+        self.assertIsNone(Matcher([]).match("bash"))
+
+    def test_cache_is_bounded(self):
+        matcher = Matcher(rules(r"\bninja\b"), cache_size=3)
+        for idx in range(10):
+            matcher.match(f"cc -c file{idx}.c")
+        matcher.match("cc -c file7.c")
+        matcher.match("ninja -j8")
+        self.assertEqual(list(matcher._cache), ["cc -c file9.c", "cc -c file7.c", "ninja -j8"])
+
+
+class ScanTest(unittest.TestCase):
+    def setUp(self):
+        self.proc = tempfile.TemporaryDirectory()
+        self.applied = []
+        self.watcher = AppWatcher(rules(r"\bninja\b", "(?i)steam"), self.proc.name,
+                                  apply=lambda rule: self.applied.append(rule.profile),
+                                  restore=lambda: self.applied.append(None))
+
+    def tearDown(self):
+        self.proc.cleanup()
+
+    def spawn(self, pid: int, *argv: str) -> None:
+        os.mkdir(f"{self.proc.name}/{pid}")
+        with open(f"{self.proc.name}/{pid}/cmdline", 'wb') as f:
+            f.write(b"\0".join(arg.encode() for arg in argv) + b"\0")
+
+    def kill(self, pid: int) -> None:
+        os.unlink(f"{self.proc.name}/{pid}/cmdline")
+        os.rmdir(f"{self.proc.name}/{pid}")
+
+    def test_switch_and_restore(self):
+        self.spawn(1, "/sbin/init")
+        self.spawn(20, "/usr/bin/Steam", "-silent")
+        self.watcher.scan()
+        self.assertTrue(self.watcher.update())
+        self.spawn(30, "ninja", "-j8")
+        self.watcher.scan()
+        self.watcher.update()
+        self.kill(30)
+        self.watcher.scan()
+        self.watcher.update()
+        self.kill(20)
+        self.watcher.scan()
+        self.watcher.update()
+        self.assertFalse(self.watcher.update())
+        self.assertEqual(self.applied, ["profile1", "profile0", "profile1", None])
+
+    def test_only_new_pids_are_read(self):
+        self.spawn(1, "/sbin/init")
+        self.watcher.scan()
+        # A known PID is not read again, even if its command line changed
+        with open(f"{self.proc.name}/1/cmdline", 'wb') as f:
+            f.write(b"ninja\0")
+        self.watcher.scan()
+        self.assertEqual(self.watcher.matched, {})
+        self.assertEqual(self.watcher.known_pids, {1})
+
+
+if __name__ == "__main__":
+    unittest.main()